@@ -0,0 +1,102 @@
+"""
+Compare the country resolution backends.
+
+The ipinfo.io backend is exercised through a mocked transport answering after a
+configurable latency, so that no token nor network access is required. Unless a
+database file is given, the local backend uses a generated one.
+
+Usage: python -m benchmarks.geoip [--database PATH] [--lookups N] [--latency MS]
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from ipaddress import IPv4Address, ip_address
+from pathlib import Path
+
+import httpx
+
+from census_api.core.config import settings
+from census_api.geoip import IPInfoResolver, LocalResolver
+
+COUNTRIES = ["AU", "BR", "CH", "DE", "FR", "GB", "IN", "JP", "NL", "US"]
+
+
+def generate_database(path: Path, *, ranges: int) -> None:
+    bounds = sorted(random.sample(range(1, 2**32 - 1), ranges * 2))
+    with path.open("w") as f:
+        f.write("start_ip,end_ip,country\n")
+        for start, end in zip(bounds[::2], bounds[1::2], strict=True):
+            f.write(f"{IPv4Address(start)},{IPv4Address(end)},")
+            f.write(f"{random.choice(COUNTRIES)}\n")
+
+
+def report(name: str, lookups: int, elapsed: float) -> None:
+    print(
+        f"{name:<24} {lookups:>8} lookups {elapsed:>9.3f}s "
+        f"{elapsed / lookups * 1_000_000:>12.2f}µs/lookup"
+    )
+
+
+async def benchmark_local(path: Path, addresses: list[str]) -> None:
+    resolver = LocalResolver(path=str(path))
+    start = time.perf_counter()
+    await resolver.load()
+    assert resolver.database is not None
+    print(
+        f"local database load: {len(resolver.database)} ranges in "
+        f"{time.perf_counter() - start:.3f}s"
+    )
+
+    parsed = [ip_address(a) for a in addresses]
+    start = time.perf_counter()
+    for address in parsed:
+        await resolver.resolve(address=address)
+    report("local", len(parsed), time.perf_counter() - start)
+
+
+async def benchmark_ipinfo(addresses: list[str], *, latency: float) -> None:
+    async def handler(_: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json={"country_code": random.choice(COUNTRIES)})
+
+    settings.IPINFO_TOKEN = settings.IPINFO_TOKEN or "benchmark"
+    parsed = [ip_address(a) for a in addresses]
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        resolver = IPInfoResolver(client=client)
+
+        start = time.perf_counter()
+        for address in parsed:
+            await resolver.resolve(address=address)
+        report("ipinfo (uncached)", len(parsed), time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for address in parsed:
+            await resolver.resolve(address=address)
+        report("ipinfo (cached)", len(parsed), time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database", type=Path, help="IP ranges to country CSV")
+    parser.add_argument("--ranges", type=int, default=500_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--latency", type=float, default=20.0, help="ipinfo, in ms")
+    args = parser.parse_args()
+
+    addresses = [str(IPv4Address(random.randrange(2**32))) for _ in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.database
+        if path is None:
+            path = Path(directory) / "country.csv"
+            generate_database(path, ranges=args.ranges)
+        await benchmark_local(path, addresses)
+
+    await benchmark_ipinfo(addresses, latency=args.latency / 1000)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,385 @@
+"""
+Measure the API throughput and latency under a mix of realistic requests.
+
+Reports of new deployments, updates of known deployments and rate limited reports
+are replayed along summary and listing requests. The application runs in-process,
+either called directly through ASGI or served by uvicorn on a local port, against
+a temporary SQLite database or the configured PostgreSQL one. Country resolution
+and notifications are replaced by in-process fakes, no network access is needed.
+
+Results are saved as JSON and can be compared with the results of a previous run.
+
+Usage: python -m benchmarks.load [--server asgi|uvicorn] [--database sqlite|postgres]
+    [--requests N] [--concurrency N] [--mix new=1,update=1,...] [--output PATH]
+    [--compare PATH]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from collections.abc import AsyncGenerator, Sequence
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from ipaddress import IPv4Address
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import uvicorn
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel, col, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from census_api.core.config import settings
+from census_api.core.database import async_session
+from census_api.core.dependencies import get_read_session, get_session
+from census_api.crud.records import rebuild_counters, upsert_records
+from census_api.main import app
+from census_api.models import CensusRecord, CensusRecordUpdate
+from census_api.notifications import Notification, notification_dispatcher
+
+PREFIX = "benchmark-"
+COUNTRIES = ["AU", "BR", "CH", "DE", "FR", "GB", "IN", "JP", "NL", "US"]
+VERSIONS = ["1.8.3", "1.9.0", "1.9.1", "1.9.2", "1.10.0"]
+PYTHON_VERSIONS = ["3.10.14", "3.11.9", "3.12.4", "3.13.0"]
+DEFAULT_MIX = "new=20,update=20,rate_limited=40,summary=15,list=5"
+
+
+class FakeResolver:
+    """
+    Resolve countries from the address itself, after an optional latency.
+    """
+
+    def __init__(self, *, latency: float) -> None:
+        self.latency = latency
+        self.lookups = 0
+
+    async def resolve(self, *, address: Any) -> str | None:
+        self.lookups += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return COUNTRIES[int(address) % len(COUNTRIES)]
+
+
+class FakeNotifier:
+    def __init__(self) -> None:
+        self.notifications = 0
+
+    async def send(self, *, notifications: Sequence[Notification]) -> None:
+        self.notifications += len(notifications)
+
+
+@dataclass(frozen=True)
+class Operation:
+    kind: str
+    method: str
+    path: str
+    body: dict[str, Any] | None = None
+    headers: dict[str, str] | None = None
+
+
+def _report(deployment_id: str, rng: random.Random) -> dict[str, Any]:
+    return {
+        "deployment_id": deployment_id,
+        "version": rng.choice(VERSIONS),
+        "python_version": rng.choice(PYTHON_VERSIONS),
+    }
+
+
+def _public_address(rng: random.Random) -> str:
+    while True:
+        address = IPv4Address(rng.randrange(1 << 24, 224 << 24))
+        if address.is_global:
+            return str(address)
+
+
+def build_operations(
+    *, mix: dict[str, int], requests: int, seed: int
+) -> tuple[list[Operation], list[str], list[str]]:
+    """
+    Generate the requests to replay and the deployments they expect to exist.
+
+    Args:
+        mix (dict[str, int]): Weight of each kind of request.
+        requests (int): Number of requests to generate.
+        seed (int): Seed of the generator, the same seed gives the same requests.
+
+    Returns:
+        tuple[list[Operation], list[str], list[str]]: The requests, the deployments
+            to create before the rate limit and those to create within it.
+    """
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=requests)
+
+    stale = [f"{PREFIX}stale-{i}" for i in range(kinds.count("update"))]
+    fresh = [f"{PREFIX}fresh-{i}" for i in range(max(1, kinds.count("rate_limited")))]
+    updates = iter(stale)
+
+    operations = []
+    for i, kind in enumerate(kinds):
+        headers = {"X-Real-IP": _public_address(rng)}
+        match kind:
+            case "new":
+                body = _report(f"{PREFIX}new-{i}", rng)
+                operations.append(Operation(kind, "POST", "/records/", body, headers))
+            case "update":
+                body = _report(next(updates), rng)
+                operations.append(Operation(kind, "POST", "/records/", body, headers))
+            case "rate_limited":
+                # Popular deployments are reported more often than others
+                deployment_id = fresh[int(rng.paretovariate(1.2)) % len(fresh)]
+                body = _report(deployment_id, rng)
+                operations.append(Operation(kind, "POST", "/records/", body, headers))
+            case "summary":
+                operations.append(Operation(kind, "GET", "/records/summary"))
+            case "list":
+                operations.append(Operation(kind, "GET", "/records/?limit=100"))
+            case _:
+                raise ValueError(f"unknown request kind {kind}")
+
+    return operations, stale, fresh
+
+
+async def seed_records(
+    *, session: AsyncSession, stale: list[str], fresh: list[str]
+) -> None:
+    now = datetime.now(tz=timezone.utc)
+    rng = random.Random(0)
+    for deployment_ids, updated_at in (
+        (stale, now - timedelta(seconds=settings.RATE_LIMIT + 60)),
+        (fresh, now),
+    ):
+        for start in range(0, len(deployment_ids), 1000):
+            records = [
+                CensusRecordUpdate.model_validate(_report(deployment_id, rng))
+                for deployment_id in deployment_ids[start : start + 1000]
+            ]
+            await upsert_records(session=session, records=records, now=updated_at)
+
+
+@contextlib.asynccontextmanager
+async def sqlite_database() -> AsyncGenerator[async_sessionmaker[AsyncSession]]:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/load.db")
+        async with engine.begin() as connection:
+            await connection.run_sync(SQLModel.metadata.create_all)
+        sessionmaker = async_sessionmaker(engine, class_=AsyncSession)
+
+        async def get_session_override() -> AsyncGenerator[AsyncSession]:
+            async with sessionmaker() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = get_session_override
+        app.dependency_overrides[get_read_session] = get_session_override
+        try:
+            yield sessionmaker
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+
+
+@contextlib.asynccontextmanager
+async def postgres_database() -> AsyncGenerator[async_sessionmaker[AsyncSession]]:
+    try:
+        yield async_session
+    finally:
+        # Records are deleted without the CRUD, counters have to be rebuilt
+        async with async_session() as session:
+            await session.exec(
+                delete(CensusRecord).where(
+                    col(CensusRecord.deployment_id).startswith(PREFIX)
+                )
+            )
+            await session.commit()
+            await rebuild_counters(session=session)
+
+
+@contextlib.asynccontextmanager
+async def asgi_client() -> AsyncGenerator[httpx.AsyncClient]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url=f"http://benchmark{settings.API_V1_STR}"
+    ) as client:
+        yield client
+
+
+@contextlib.asynccontextmanager
+async def uvicorn_client(*, concurrency: int) -> AsyncGenerator[httpx.AsyncClient]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    task = asyncio.create_task(server.serve())
+    # uvicorn only exposes its startup through this flag
+    while not server.started:  # noqa: ASYNC110
+        await asyncio.sleep(0.01)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}{settings.API_V1_STR}", limits=limits
+        ) as client:
+            yield client
+    finally:
+        server.should_exit = True
+        await task
+
+
+async def replay(
+    *, client: httpx.AsyncClient, operations: list[Operation], concurrency: int
+) -> tuple[dict[str, list[float]], dict[str, int], float]:
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    pending = iter(operations)
+
+    async def worker() -> None:
+        for operation in pending:
+            start = time.perf_counter()
+            response = await client.request(
+                operation.method,
+                operation.path,
+                json=operation.body,
+                headers=operation.headers,
+            )
+            latencies[operation.kind].append(time.perf_counter() - start)
+            if response.status_code >= 400:  # noqa: PLR2004
+                errors[operation.kind] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def summarise(latencies: list[float], *, errors: int, elapsed: float) -> dict[str, Any]:
+    if len(latencies) < 2:  # noqa: PLR2004
+        latencies = latencies * 2
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(quantiles[49] * 1000, 3),
+        "p95_ms": round(quantiles[94] * 1000, 3),
+        "p99_ms": round(quantiles[98] * 1000, 3),
+    }
+
+
+def print_results(results: dict[str, Any], previous: dict[str, Any] | None) -> None:
+    print(
+        f"{'':<14} {'requests':>9} {'errors':>7} {'req/s':>10} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    )
+    for kind, stats in results["operations"].items():
+        line = (
+            f"{kind:<14} {stats['requests']:>9} {stats['errors']:>7} "
+            f"{stats['rps']:>10.1f} {stats['p50_ms']:>9.2f} "
+            f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+        )
+        if previous and (before := previous["operations"].get(kind)):
+            change = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+            line += f"   p95 {change:+.1f}% vs {previous['commit'] or 'previous'}"
+        print(line)
+
+
+def _commit() -> str | None:
+    with contextlib.suppress(OSError, subprocess.CalledProcessError):
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    return None
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--server", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--database", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"default: {DEFAULT_MIX}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--geoip-latency", type=float, default=0.0, help="in ms")
+    parser.add_argument("--output", type=Path, help="file to save results to")
+    parser.add_argument("--compare", type=Path, help="results of a previous run")
+    args = parser.parse_args()
+
+    mix = {
+        kind: int(weight)
+        for kind, weight in (item.split("=") for item in args.mix.split(","))
+    }
+    operations, stale, fresh = build_operations(
+        mix=mix, requests=args.requests, seed=args.seed
+    )
+
+    # Periodic jobs would add noise, and uvicorn runs them against the real database
+    settings.RETENTION_INTERVAL = settings.ROLLUP_INTERVAL = 0
+    settings.GEOIP_BACKEND = "ipinfo"
+
+    resolver = FakeResolver(latency=args.geoip_latency / 1000)
+    notifier = FakeNotifier()
+    database = sqlite_database() if args.database == "sqlite" else postgres_database()
+    with (
+        patch("census_api.utils.get_resolver", return_value=resolver),
+        patch.object(notification_dispatcher, "notifiers", [notifier]),
+    ):
+        async with database as sessionmaker:
+            async with sessionmaker() as session:
+                await seed_records(session=session, stale=stale, fresh=fresh)
+
+            client = (
+                asgi_client()
+                if args.server == "asgi"
+                else uvicorn_client(concurrency=args.concurrency)
+            )
+            async with client as c:
+                latencies, errors, elapsed = await replay(
+                    client=c, operations=operations, concurrency=args.concurrency
+                )
+
+    operations_stats = {
+        kind: summarise(values, errors=errors[kind], elapsed=elapsed)
+        for kind, values in sorted(latencies.items())
+    }
+    operations_stats["overall"] = summarise(
+        [latency for values in latencies.values() for latency in values],
+        errors=sum(errors.values()),
+        elapsed=elapsed,
+    )
+    results = {
+        "commit": _commit(),
+        "date": datetime.now(tz=timezone.utc).isoformat(),
+        "parameters": {
+            key: str(value) if isinstance(value, Path) else value
+            for key, value in vars(args).items()
+        },
+        "operations": operations_stats,
+        "geoip_lookups": resolver.lookups,
+        "notifications": notifier.notifications,
+    }
+
+    previous = json.loads(args.compare.read_text()) if args.compare else None
+    print_results(results, previous)
+    print(
+        f"{resolver.lookups} country lookups, {notifier.notifications} notifications, "
+        f"{elapsed:.2f}s"
+    )
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
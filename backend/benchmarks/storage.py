@@ -0,0 +1,62 @@
+"""
+Report the storage used by census records in the configured PostgreSQL database.
+
+Prints the size of the table and of each of its indexes, then the average size of
+each column, to tell where bytes go before changing the schema.
+
+Usage: python -m benchmarks.storage
+"""
+
+import asyncio
+
+from sqlmodel import func, select, text
+
+from census_api.core.database import async_session
+from census_api.crud.dialect import is_postgresql
+from census_api.models import CensusRecord
+
+TABLE = CensusRecord.__tablename__
+
+
+def _size(size: int) -> str:
+    return f"{size / 1024 / 1024:>10.1f} MB"
+
+
+async def main() -> None:
+    async with async_session() as session:
+        if not is_postgresql(session=session):
+            raise SystemExit("this report needs a PostgreSQL database")
+        connection = await session.connection()
+
+        result = await connection.execute(
+            text(
+                "SELECT count(*), pg_table_size(:table), "
+                "avg(pg_column_size(t.*)) FROM censusrecord AS t"
+            ),
+            {"table": TABLE},
+        )
+        rows, table_size, row_size = result.one()
+        print(f"{TABLE:<32} {_size(table_size)} {rows:>12} rows")
+
+        result = await connection.execute(
+            text(
+                "SELECT indexrelid::regclass::text, pg_relation_size(indexrelid) "
+                "FROM pg_index WHERE indrelid = CAST(:table AS regclass) "
+                "ORDER BY 1"
+            ),
+            {"table": TABLE},
+        )
+        for name, size in result.all():
+            print(f"  {name:<30} {_size(size)}")
+
+        print(f"\naverage row {float(row_size or 0):.1f} bytes, including its header")
+        for column in CensusRecord.__table__.columns:  # type: ignore[attr-defined]
+            result = await connection.execute(
+                select(func.avg(func.pg_column_size(column)))
+            )
+            size = result.scalar_one()
+            print(f"  {column.name:<30} {float(size or 0):>6.1f} bytes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
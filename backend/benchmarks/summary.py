@@ -0,0 +1,106 @@
+"""
+Compare counting records per dimension with one query per dimension and with a
+single `GROUPING SETS` query.
+
+Records are generated in the configured PostgreSQL database, inside a transaction
+which is rolled back once done, so existing records are left untouched.
+
+Usage: python -m benchmarks.summary [--records N] [--runs N]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+
+from sqlmodel import func, select, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from census_api.core.database import async_session
+from census_api.crud.counters import DimensionCounts
+from census_api.crud.dialect import is_postgresql
+from census_api.crud.records import count_records
+from census_api.enums import CensusDimension
+from census_api.models import CensusRecord
+
+SEED = text(
+    """
+    INSERT INTO censusrecord
+        (deployment_id, version, python_version, country, created_at, updated_at)
+    SELECT
+        'benchmark-' || i,
+        '1.' || (i % 12) || '.' || (i % 3),
+        CASE WHEN i % 50 = 0 THEN NULL ELSE '3.' || (9 + i % 5) END,
+        (ARRAY['FR', 'DE', 'US', 'GB', 'NL', 'JP', 'BR', NULL])[1 + i % 8],
+        now(),
+        now()
+    FROM generate_series(1, :records) AS i
+    """
+)
+
+
+async def count_records_per_dimension(*, session: AsyncSession) -> DimensionCounts:
+    # Previous implementation, scanning the table once per dimension
+    counts: DimensionCounts = {}
+    for dimension in CensusDimension:
+        column = getattr(CensusRecord, dimension.value)
+        result = await session.exec(select(column, func.count()).group_by(column))
+        counts[dimension] = [(label, count) for label, count in result.all()]
+    return counts
+
+
+async def measure(
+    name: str,
+    func: Callable[..., Awaitable[DimensionCounts]],
+    *,
+    session: AsyncSession,
+    runs: int,
+) -> DimensionCounts:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        counts = await func(session=session)
+        timings.append(time.perf_counter() - start)
+    print(
+        f"{name:<24} median {statistics.median(timings) * 1000:>9.1f}ms "
+        f"min {min(timings) * 1000:>9.1f}ms over {runs} runs"
+    )
+    return counts
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    async with async_session() as session:
+        if not is_postgresql(session=session):
+            raise SystemExit("this benchmark needs a PostgreSQL database")
+
+        start = time.perf_counter()
+        connection = await session.connection()
+        await connection.execute(SEED, {"records": args.records})
+        await connection.execute(text("ANALYZE censusrecord"))
+        print(f"seeded {args.records} records in {time.perf_counter() - start:.1f}s")
+
+        try:
+            per_dimension = await measure(
+                "one query per dimension",
+                count_records_per_dimension,
+                session=session,
+                runs=args.runs,
+            )
+            grouping_sets = await measure(
+                "grouping sets", count_records, session=session, runs=args.runs
+            )
+            assert {d: sorted(c, key=str) for d, c in per_dimension.items()} == {
+                d: sorted(c, key=str) for d, c in grouping_sets.items()
+            }
+        finally:
+            await session.rollback()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,43 @@
+"""Add census counters
+
+Revision ID: 127ec1c5388e
+Revises: ea621955ea61
+Create Date: 2026-10-17 09:12:41.503127
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = "127ec1c5388e"
+down_revision: Union[str, None] = "ea621955ea61"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "censuscounter",
+        sa.Column("dimension", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("label", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("dimension", "label"),
+    )
+    for dimension in ("version", "python_version", "country"):
+        op.execute(
+            f"""
+            INSERT INTO "censuscounter" ("dimension", "label", "count")
+            SELECT '{dimension}', COALESCE("{dimension}", ''), COUNT(*)
+            FROM "censusrecord"
+            GROUP BY COALESCE("{dimension}", '')
+            """
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("censuscounter")
@@ -0,0 +1,31 @@
+"""Index census record updated_at
+
+Revision ID: 2e6ec47672e7
+Revises: 127ec1c5388e
+Create Date: 2026-10-17 10:03:27.918264
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "2e6ec47672e7"
+down_revision: Union[str, None] = "127ec1c5388e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        op.f("ix_censusrecord_updated_at"),
+        "censusrecord",
+        ["updated_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_censusrecord_updated_at"), table_name="censusrecord")
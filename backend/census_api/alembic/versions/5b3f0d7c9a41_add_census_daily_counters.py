@@ -0,0 +1,44 @@
+"""Add census daily counters
+
+Revision ID: 5b3f0d7c9a41
+Revises: 2e6ec47672e7
+Create Date: 2026-10-17 15:21:08.336512
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5b3f0d7c9a41"
+down_revision: Union[str, None] = "2e6ec47672e7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "censusdailycounter",
+        sa.Column("dimension", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("label", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("dimension", "day", "label"),
+    )
+    # History starts with the current distribution
+    op.execute(
+        """
+        INSERT INTO "censusdailycounter" ("dimension", "day", "label", "count")
+        SELECT "dimension", (now() AT TIME ZONE 'utc')::date, "label", "count"
+        FROM "censuscounter"
+        WHERE "count" > 0
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("censusdailycounter")
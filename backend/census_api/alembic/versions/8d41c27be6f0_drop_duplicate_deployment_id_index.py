@@ -0,0 +1,32 @@
+"""Drop duplicate census record deployment_id index
+
+Revision ID: 8d41c27be6f0
+Revises: 5b3f0d7c9a41
+Create Date: 2026-10-17 18:02:45.117209
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8d41c27be6f0"
+down_revision: Union[str, None] = "5b3f0d7c9a41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The primary key index already covers lookups by deployment_id
+    op.drop_index(op.f("ix_censusrecord_deployment_id"), table_name="censusrecord")
+
+
+def downgrade() -> None:
+    op.create_index(
+        op.f("ix_censusrecord_deployment_id"),
+        "censusrecord",
+        ["deployment_id"],
+        unique=False,
+    )
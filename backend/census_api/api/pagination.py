@@ -0,0 +1,39 @@
+import base64
+import binascii
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(deployment_id: str) -> str:
+    """
+    Return an opaque cursor pointing after the given deployment ID.
+
+    Args:
+        deployment_id (str): Deployment ID of the last record of a page.
+
+    Returns:
+        str: A URL safe cursor to request the next page with.
+    """
+    return base64.urlsafe_b64encode(deployment_id.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    """
+    Return the deployment ID a cursor points after.
+
+    Args:
+        cursor (str): Cursor returned along a previous page.
+
+    Raises:
+        HTTPException: If the cursor is not a valid one.
+
+    Returns:
+        str: Deployment ID after which the next page starts.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.urlsafe_b64decode(padded.encode()).decode()
+    except (binascii.Error, UnicodeError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        ) from exc
@@ -4,14 +4,31 @@ from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 from sqlmodel import select
 
-from ...core.dependencies import SessionDep
+from ...core.database import engine, get_pool_stats, replica_engine
+from ...core.dependencies import ReadSessionDep
+from ...geoip import ipinfo_resolver
+from ...services.records import rate_limit_cache, report_buffer
 
 router = APIRouter()
 
 
 @router.get("/", response_model=dict[str, Any])
-async def get_health(*, session: SessionDep) -> JSONResponse:
+async def get_health(*, session: ReadSessionDep) -> JSONResponse:
     result = await session.exec(select(1))
     result.close()
 
     return JSONResponse(content={"ok": True})
+
+
+@router.get("/stats", response_model=dict[str, Any])
+async def get_stats() -> JSONResponse:
+    stats = {
+        "database_pool": get_pool_stats(engine=engine),
+        "geoip_cache": ipinfo_resolver.cache.stats(),
+        "rate_limit_cache": rate_limit_cache.stats(),
+        "ingest_buffer": {"size": len(report_buffer)},
+    }
+    if replica_engine is not None:
+        stats["database_replica_pool"] = get_pool_stats(engine=replica_engine)
+
+    return JSONResponse(content=stats)
@@ -1,36 +1,186 @@
 from collections.abc import Sequence
+from datetime import date, datetime, timedelta, timezone
 from typing import Annotated
 
-from fastapi import APIRouter, Header, Query
+from fastapi import (
+    APIRouter,
+    Body,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
 
-from ...core.dependencies import SessionDep
+from ...core.config import settings
+from ...core.dependencies import ReadSessionDep, SessionDep
 from ...crud import records as crud
-from ...models import CensusRecord, CensusRecordUpdate, CensusSummaries
-from ...services.records import process_census_report
+from ...enums import CensusDimension
+from ...models import (
+    CensusHistory,
+    CensusRecord,
+    CensusRecordBatchItem,
+    CensusRecordBatchResult,
+    CensusRecordUpdate,
+    CensusSummaries,
+)
+from ...services.export import (
+    accepts_gzip,
+    export_records,
+    gzip_chunks,
+    negotiate_media_type,
+)
+from ...services.records import (
+    buffer_census_report,
+    is_trusted_relay,
+    process_census_report,
+    process_census_reports,
+    with_real_ip,
+)
+from ...services.summary import etag_matches, summary_cache
+from ..pagination import decode_cursor, encode_cursor
 
 router = APIRouter()
 
 
-@router.post("/", response_model=CensusRecord)
+@router.post(
+    "/",
+    response_model=CensusRecord,
+    responses={status.HTTP_202_ACCEPTED: {"description": "Report buffered"}},
+)
 async def create_record(
     *,
     session: SessionDep,
     record: CensusRecordUpdate,
     real_ip: Annotated[str | None, Header(alias="X-Real-IP")] = None,
-) -> CensusRecord:
-    return await process_census_report(session=session, record=record, real_ip=real_ip)
+) -> CensusRecord | Response:
+    if not settings.INGEST_BUFFER:
+        return await process_census_report(
+            session=session, record=record, real_ip=real_ip
+        )
 
+    if (cached := await buffer_census_report(record=record, real_ip=real_ip)) is None:
+        return Response(status_code=status.HTTP_202_ACCEPTED)
+    return cached
 
-@router.get("/", response_model=list[CensusRecord])
-async def read_records(
+
+@router.post("/batch", response_model=list[CensusRecordBatchResult])
+async def create_records(
     *,
     session: SessionDep,
+    records: Annotated[
+        list[CensusRecordBatchItem], Body(max_length=settings.BATCH_MAX_SIZE)
+    ],
+    real_ip: Annotated[str | None, Header(alias="X-Real-IP")] = None,
+    relay_token: Annotated[str | None, Header(alias="X-Relay-Token")] = None,
+) -> list[CensusRecordBatchResult]:
+    # Addresses decide countries, only relays may set them for each report
+    if not is_trusted_relay(token=relay_token):
+        records = with_real_ip(records=records, real_ip=real_ip)
+    return await process_census_reports(session=session, records=records)
+
+
+@router.get("/", response_model=list[CensusRecord])
+async def read_records(  # noqa: PLR0913
+    *,
+    request: Request,
+    response: Response,
+    session: ReadSessionDep,
     offset: int = 0,
     limit: int = Query(default=100, le=100),
+    cursor: str | None = None,
 ) -> Sequence[CensusRecord]:
-    return await crud.get_records(session=session, offset=offset, limit=limit)
+    records = await crud.get_records(
+        session=session,
+        offset=offset,
+        limit=limit,
+        after=decode_cursor(cursor) if cursor else None,
+    )
+
+    # A full page may be followed by another one
+    if records and len(records) == limit:
+        next_cursor = encode_cursor(records[-1].deployment_id)
+        next_url = request.url.remove_query_params("offset").include_query_params(
+            cursor=next_cursor
+        )
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+    return records
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"application/x-ndjson": {}, "text/csv": {}},
+            "description": "All records, as NDJSON or CSV depending on `Accept`.",
+        }
+    },
+)
+async def export(
+    *,
+    session: ReadSessionDep,
+    accept: Annotated[str | None, Header()] = None,
+    accept_encoding: Annotated[str | None, Header()] = None,
+) -> StreamingResponse:
+    media_type = negotiate_media_type(accept=accept)
+    chunks = export_records(session=session, media_type=media_type)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+
+    if accepts_gzip(accept_encoding=accept_encoding):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
 
 
 @router.get("/summary", response_model=CensusSummaries)
-async def read_summary(*, session: SessionDep) -> CensusSummaries:
-    return await crud.get_summary(session=session)
+async def read_summary(
+    *,
+    session: ReadSessionDep,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    summary = await summary_cache.get(session=session)
+    headers = {
+        "ETag": summary.etag,
+        "Cache-Control": f"public, max-age={settings.SUMMARY_CACHE_TTL}",
+    }
+
+    if if_none_match and etag_matches(if_none_match=if_none_match, etag=summary.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=summary.body, media_type="application/json", headers=headers
+    )
+
+
+@router.get("/summary/history", response_model=CensusHistory)
+async def read_summary_history(
+    *,
+    response: Response,
+    session: ReadSessionDep,
+    dimension: CensusDimension,
+    since: date | None = None,
+    until: date | None = None,
+) -> CensusHistory:
+    until = until or datetime.now(tz=timezone.utc).date()
+    # The default range starts no earlier than the first representable day
+    days = min(settings.HISTORY_DAYS - 1, (until - date.min).days)
+    since = since or until - timedelta(days=days)
+    if since > until:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The start of the range is after its end",
+        )
+
+    response.headers["Cache-Control"] = f"public, max-age={settings.ROLLUP_INTERVAL}"
+    return await crud.get_summary_history(
+        session=session,
+        dimension=dimension,
+        since=since,
+        until=until,
+        max_points=settings.HISTORY_MAX_POINTS,
+    )
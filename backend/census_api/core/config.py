@@ -50,6 +50,11 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
+    POSTGRES_POOL_SIZE: int = 5  # Connections kept open by each worker
+    POSTGRES_MAX_OVERFLOW: int = 10  # Connections opened beyond the pool size
+    POSTGRES_POOL_TIMEOUT: float = 30.0  # Time in second to wait for a connection
+    POSTGRES_POOL_RECYCLE: int = 1800  # Time in second before replacing a connection
+    POSTGRES_POOL_PRE_PING: bool = True  # Check connections before using them
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -63,12 +68,77 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    # Optional read replica, connection settings default to the primary ones
+    POSTGRES_REPLICA_SERVER: str | None = None
+    POSTGRES_REPLICA_PORT: int | None = None
+    POSTGRES_REPLICA_USER: str | None = None
+    POSTGRES_REPLICA_PASSWORD: str | None = None
+    POSTGRES_REPLICA_DB: str | None = None
+    POSTGRES_REPLICA_RETRY_INTERVAL: float = 30.0  # Time in second before retrying
+    POSTGRES_REPLICA_CONNECT_TIMEOUT: int = 2  # Time in second to open a connection
+    POSTGRES_REPLICA_SLOW_CONNECT: float = 0.5  # Time in second before others skip it
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def SQLALCHEMY_REPLICA_DATABASE_URI(self) -> MultiHostUrl | None:  # noqa: N802
+        if not self.POSTGRES_REPLICA_SERVER:
+            return None
+        return MultiHostUrl.build(
+            scheme="postgresql+psycopg",
+            username=self.POSTGRES_REPLICA_USER or self.POSTGRES_USER,
+            password=self.POSTGRES_REPLICA_PASSWORD or self.POSTGRES_PASSWORD,
+            host=self.POSTGRES_REPLICA_SERVER,
+            port=self.POSTGRES_REPLICA_PORT or self.POSTGRES_PORT,
+            path=self.POSTGRES_REPLICA_DB or self.POSTGRES_DB,
+        )
+
     RECORD_RETENTION: int = 365  # Number of days to keep records without updates
+    RETENTION_INTERVAL: int = 3600  # Time in second between two retention runs
+    RETENTION_BATCH_SIZE: int = 1000  # Number of records deleted per transaction
+    ROLLUP_INTERVAL: int = 3600  # Time in second between two daily snapshots
+    HISTORY_DAYS: int = 365  # Number of days of history returned by default
+    HISTORY_MAX_POINTS: int = 366  # Points in a history before it is downsampled
     RATE_LIMIT: int = 3600 * 6  # Time in second between two updates
+    RATE_LIMIT_CACHE_SIZE: int = 100000  # Rate limited deployments kept in memory
+    RATE_LIMIT_CACHE_MARGIN: int = 60  # Time in second left to the database check
+    SUMMARY_CACHE_TTL: int = 60  # Time in second to serve a cached summary
+    SUMMARY_SNAPSHOT_DIR: str = ""  # Directory to write summary files for the frontend
+    SUMMARY_SNAPSHOT_INTERVAL: int = 60  # Time in second between two summary files
+    SUMMARY_SNAPSHOT_MAX_AGE: int = 600  # Time in second a summary file can be used
+    EXPORT_BATCH_SIZE: int = 1000  # Number of records fetched at once for exports
+    RESPONSE_GZIP_MIN_SIZE: int = 0  # Bytes from which responses are gzipped, 0 never
+    BATCH_MAX_SIZE: int = 1000  # Reports accepted by a single batch request
+    BATCH_RELAY_TOKEN: str = ""  # Token of relays allowed to set report addresses
+    INGEST_BUFFER: bool = False  # Acknowledge reports before writing them in batches
+    INGEST_BUFFER_INTERVAL: float = 0.5  # Time in second a report may stay unwritten
+    INGEST_BUFFER_BATCH_SIZE: int = 500  # Buffered reports written together at most
+    INGEST_BUFFER_SIZE: int = 10000  # Buffered reports before new ones have to wait
+    INGEST_BUFFER_SHUTDOWN_TIMEOUT: float = 10.0  # Time in second to flush the buffer
+    INGEST_BUFFER_MAX_RETRIES: int = 5  # Failed writes retried before dropping reports
+    INGEST_BUFFER_RETRY_BACKOFF: float = 1.0  # Time in second before a retry, doubled
+
+    HTTP_MAX_CONNECTIONS: int = 100  # Outbound connections across all hosts
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20  # Idle connections kept open
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # Time in second to keep idle connections
+    HTTP_CONNECT_TIMEOUT: float = 5.0  # Time in second to establish a connection
+    HTTP_READ_TIMEOUT: float = 10.0  # Time in second to wait for a response chunk
+    HTTP2: bool = True  # Negotiate HTTP/2 with hosts supporting it
 
     IPINFO_API_URL: str = "https://api.ipinfo.io/lite/"
     IPINFO_TOKEN: str = ""
 
+    GEOIP_BACKEND: Literal["ipinfo", "local"] = "ipinfo"
+    GEOIP_DATABASE_PATH: str = ""  # IP ranges to country CSV file for local lookups
+    GEOIP_DATABASE_RELOAD: bool = True  # Reload the database file when it changes
+    GEOIP_CACHE_SIZE: int = 10000  # Number of IP addresses to keep countries for
+    GEOIP_CACHE_TTL: int = 3600 * 24  # Time in second to keep a resolved country
+    GEOIP_CACHE_NEGATIVE_TTL: int = 3600  # Time in second to keep a missing country
+    GEOIP_BATCH_CONCURRENCY: int = 10  # Lookups of a batch of reports run at once
+
+    NOTIFICATION_QUEUE_SIZE: int = 1000  # Notifications waiting to be sent
+    NOTIFICATION_BATCH_SIZE: int = 50  # Notifications sent together at most
+    NOTIFICATION_SHUTDOWN_TIMEOUT: float = 10.0  # Time in second to drain the queue
+
     DISCORD_WEBHOOK_USERNAME: str = "Peering Manager Census"
     DISCORD_WEBHOOK_URL: str = ""
 
@@ -93,5 +163,15 @@ class Settings(BaseSettings):
 
         return self
 
+    @model_validator(mode="after")
+    def _require_geoip_database(self) -> Self:
+        # An empty path would resolve to, and watch, the working directory
+        if self.GEOIP_BACKEND == "local" and not self.GEOIP_DATABASE_PATH:
+            raise ValueError(
+                "GEOIP_DATABASE_PATH must be set to use the local GEOIP_BACKEND."
+            )
+
+        return self
+
 
 settings = Settings()  # type: ignore
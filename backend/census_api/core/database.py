@@ -1,5 +1,234 @@
-from sqlalchemy.ext.asyncio import create_async_engine
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .config import settings
+from .metrics import DB_POOL_CHECKED_OUT, DB_POOL_TIMEOUTS, DB_POOL_WAIT_SECONDS
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Connection pool keeping track of checkouts and of the time spent waiting for
+    them, which grows when the pool is saturated.
+
+    The pool logging name, if any, labels the pool's metrics.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.name = self._orig_logging_name or "primary"
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            DB_POOL_TIMEOUTS.labels(database=self.name).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_time += elapsed
+            self.max_wait_time = max(self.max_wait_time, elapsed)
+            DB_POOL_WAIT_SECONDS.labels(database=self.name).observe(elapsed)
+            DB_POOL_CHECKED_OUT.labels(database=self.name).set(self.checkedout())
+
+    def _do_return_conn(self, record: ConnectionPoolEntry) -> None:
+        super()._do_return_conn(record)
+        DB_POOL_CHECKED_OUT.labels(database=self.name).set(self.checkedout())
+
+    def stats(self) -> dict[str, Any]:
+        capacity = self.size() + self._max_overflow
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "saturation": round(self.checkedout() / capacity, 3) if capacity else 0,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_time": round(self.wait_time, 6),
+            "max_wait_time": round(self.max_wait_time, 6),
+        }
+
+
+class ReadSession(AsyncSession):
+    """
+    Session for read-only queries, choosing between the replica and the primary when
+    it first connects rather than when it is opened.
+
+    Sessions left unused, by requests answered from a cache for instance, do not
+    check a connection out of either pool.
+    """
+
+    def __init__(self, *, factory: "ReadSessionFactory", **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.factory = factory
+        self._bound = False
+
+    async def _bind(self) -> None:
+        if not self._bound:
+            self._bound = True
+            await self.factory.bind(session=self)
+
+    async def connection(self, *args: Any, **kwargs: Any) -> Any:
+        await self._bind()
+        return await super().connection(*args, **kwargs)
+
+    async def exec(self, *args: Any, **kwargs: Any) -> Any:
+        await self._bind()
+        return await super().exec(*args, **kwargs)
+
+    async def execute(self, *args: Any, **kwargs: Any) -> Any:
+        await self._bind()
+        return await super().execute(*args, **kwargs)
+
+    async def scalar(self, *args: Any, **kwargs: Any) -> Any:
+        await self._bind()
+        return await super().scalar(*args, **kwargs)
+
+    async def get(self, *args: Any, **kwargs: Any) -> Any:
+        await self._bind()
+        return await super().get(*args, **kwargs)
+
+    async def get_one(self, *args: Any, **kwargs: Any) -> Any:
+        await self._bind()
+        return await super().get_one(*args, **kwargs)
+
+    async def stream(self, *args: Any, **kwargs: Any) -> Any:
+        await self._bind()
+        return await super().stream(*args, **kwargs)
+
+    async def run_sync(self, *args: Any, **kwargs: Any) -> Any:
+        await self._bind()
+        return await super().run_sync(*args, **kwargs)
+
+
+class ReadSessionFactory:
+    """
+    Open sessions for read-only queries on the replica, if any.
+
+    When the replica cannot be connected to, sessions fall back to the primary and
+    the replica is not tried again before the retry interval has elapsed. A connection
+    taking longer than `slow_connect` already sends other sessions to the primary,
+    until it succeeds.
+    """
+
+    def __init__(
+        self,
+        *,
+        primary: AsyncEngine,
+        replica: AsyncEngine | None,
+        retry_interval: float,
+        slow_connect: float,
+    ) -> None:
+        self.primary = primary
+        self.replica = replica
+        self.retry_interval = retry_interval
+        self.slow_connect = slow_connect
+        self._retry_at = 0.0
+
+    async def _connect(self, session: AsyncSession) -> None:
+        attempt = asyncio.ensure_future(session.connection())
+        try:
+            done, _ = await asyncio.wait({attempt}, timeout=self.slow_connect)
+            if not done:
+                # Concurrent sessions do not wait on an unresponsive replica too
+                self._retry_at = marked = time.monotonic() + self.retry_interval
+                await attempt
+                if self._retry_at == marked:
+                    self._retry_at = 0.0
+            await attempt
+        except BaseException:
+            attempt.cancel()
+            raise
+
+    async def bind(self, *, session: AsyncSession) -> None:
+        """
+        Connect a session opened on the replica, or move it to the primary.
+
+        Args:
+            session (AsyncSession): Session not connected yet.
+        """
+        if self.replica is None:
+            return
+
+        if time.monotonic() >= self._retry_at:
+            try:
+                await self._connect(session)
+            except (DBAPIError, OSError, PoolTimeoutError) as exc:
+                # A saturated replica pool is a reason to fall back as well
+                self._retry_at = time.monotonic() + self.retry_interval
+                logging.warning(f"database replica unavailable: {exc}")
+                await session.close()
+            else:
+                return
+
+        session.bind = self.primary
+        session.sync_session.bind = self.primary.sync_engine
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        async with ReadSession(
+            factory=self, bind=self.replica or self.primary, expire_on_commit=False
+        ) as session:
+            yield session
+
+
+def _create_engine(
+    url: str, *, name: str, connect_args: dict[str, Any] | None = None
+) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        connect_args=connect_args or {},
+        poolclass=InstrumentedPool,
+        pool_logging_name=name,
+        pool_size=settings.POSTGRES_POOL_SIZE,
+        max_overflow=settings.POSTGRES_MAX_OVERFLOW,
+        pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+        pool_recycle=settings.POSTGRES_POOL_RECYCLE,
+        pool_pre_ping=settings.POSTGRES_POOL_PRE_PING,
+    )
+
+
+engine = _create_engine(str(settings.SQLALCHEMY_DATABASE_URI), name="primary")
+async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+replica_engine = None
+if settings.SQLALCHEMY_REPLICA_DATABASE_URI:
+    # Fail fast on an unresponsive replica, rather than after the TCP timeout
+    replica_engine = _create_engine(
+        str(settings.SQLALCHEMY_REPLICA_DATABASE_URI),
+        name="replica",
+        connect_args={"connect_timeout": settings.POSTGRES_REPLICA_CONNECT_TIMEOUT},
+    )
+
+read_session = ReadSessionFactory(
+    primary=engine,
+    replica=replica_engine,
+    retry_interval=settings.POSTGRES_REPLICA_RETRY_INTERVAL,
+    slow_connect=settings.POSTGRES_REPLICA_SLOW_CONNECT,
+)
+
 
-engine = create_async_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+def get_pool_stats(*, engine: AsyncEngine) -> dict[str, Any]:
+    pool = engine.pool
+    return pool.stats() if isinstance(pool, InstrumentedPool) else {}
@@ -0,0 +1,44 @@
+import importlib.util
+
+import httpx
+
+from .config import settings
+
+
+class SharedHTTPClient:
+    """
+    HTTP client shared by all outbound calls to reuse pooled connections.
+
+    The client is created on first use, or when the application starts, and is
+    closed when the application shuts down.
+    """
+
+    def __init__(self) -> None:
+        self._client: httpx.AsyncClient | None = None
+
+    def get(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                # HTTP/2 requires the optional h2 package
+                http2=settings.HTTP2 and importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(
+                    connect=settings.HTTP_CONNECT_TIMEOUT,
+                    read=settings.HTTP_READ_TIMEOUT,
+                    write=settings.HTTP_READ_TIMEOUT,
+                    pool=settings.HTTP_CONNECT_TIMEOUT,
+                ),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+http_client = SharedHTTPClient()
@@ -0,0 +1,122 @@
+import os
+import time
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Metrics are aggregated across gunicorn workers when this directory is set, it
+# must be emptied before the application starts
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+REPORTS = Counter("census_reports", "Census reports received, by outcome", ["outcome"])
+INGEST_STAGE_SECONDS = Histogram(
+    "census_ingest_stage_seconds",
+    "Time spent in each stage of processing a census report",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+INGEST_BUFFER_FLUSH_SIZE = Histogram(
+    "census_ingest_buffer_flush_size",
+    "Census reports written together by the write-behind buffer",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+INGEST_BUFFER_DROPPED = Counter(
+    "census_ingest_buffer_dropped",
+    "Buffered census reports given up on after failing to be written",
+)
+
+HTTP_REQUESTS = Counter(
+    "census_http_requests", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "census_http_request_duration_seconds",
+    "Time spent handling HTTP requests",
+    ["method", "route"],
+)
+OUTBOUND_HTTP_ERRORS = Counter(
+    "census_outbound_http_errors", "Failed outbound HTTP calls", ["service", "reason"]
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "census_db_pool_checked_out_connections",
+    "Database connections currently in use",
+    ["database"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "census_db_pool_wait_seconds",
+    "Time spent waiting for a database connection",
+    ["database"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "census_db_pool_timeouts",
+    "Database connection requests which timed out",
+    ["database"],
+)
+
+RETENTION_DELETED = Counter(
+    "census_retention_deleted_records", "Records deleted by the retention job"
+)
+RETENTION_SECONDS = Histogram(
+    "census_retention_duration_seconds", "Time spent running the retention job"
+)
+RETENTION_LAST_SUCCESS = Gauge(
+    "census_retention_last_success_timestamp_seconds",
+    "Time of the last successful retention job run",
+    multiprocess_mode="max",
+)
+SUMMARY_SNAPSHOT_LAST_SUCCESS = Gauge(
+    "census_summary_snapshot_last_success_timestamp_seconds",
+    "Time of the last summary snapshot written for the frontend",
+    multiprocess_mode="max",
+)
+
+
+def generate_metrics() -> bytes:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)  # type: ignore[no-untyped-call]
+        return generate_latest(registry)
+    return generate_latest()
+
+
+class MetricsMiddleware:
+    """
+    Count HTTP requests and time them, by route template to keep labels bounded.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The route is only known once the router has matched the request
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.labels(method=method, route=route).observe(
+                time.perf_counter() - start
+            )
+            HTTP_REQUESTS.labels(method=method, route=route, status=status_code).inc()
@@ -0,0 +1,57 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from ..crud.dialect import try_advisory_xact_lock
+from .database import async_session
+
+
+async def run_exclusively(*, name: str, func: Callable[[], Awaitable[Any]]) -> bool:
+    """
+    Run a function, unless another process is already running it.
+
+    Args:
+        name (str): Name of the task, identifying it across processes.
+        func (Callable[[], Awaitable[Any]]): Function to run.
+
+    Returns:
+        bool: Whether the function was run.
+    """
+    # The lock is held by a transaction of the primary until the function returns
+    async with async_session() as session:
+        if not await try_advisory_xact_lock(session=session, name=f"task:{name}"):
+            logging.debug(f"{name} task already running in another process")
+            return False
+        await func()
+        return True
+
+
+async def run_periodically(
+    *,
+    name: str,
+    interval: float,
+    func: Callable[[], Awaitable[Any]],
+    exclusive: bool = False,
+) -> None:
+    """
+    Run a function forever, waiting for an interval between two runs.
+
+    Failures are logged and do not stop the next runs.
+
+    Args:
+        name (str): Name of the task, used in logs.
+        interval (float): Time in second between the end of a run and the next one.
+        func (Callable[[], Awaitable[Any]]): Function to run.
+        exclusive (bool): Skip runs while another process, such as another worker,
+            is running the same task.
+    """
+    while True:
+        try:
+            if exclusive:
+                await run_exclusively(name=name, func=func)
+            else:
+                await func()
+        except Exception:
+            logging.exception(f"{name} task failure")
+        await asyncio.sleep(interval)
@@ -0,0 +1,152 @@
+from collections import Counter, defaultdict
+from collections.abc import Sequence
+from datetime import date
+from typing import Any
+
+from sqlmodel import col, delete, literal, select, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..enums import CensusDimension
+from ..models import CensusCounter, CensusDailyCounter
+from .dialect import insert, is_postgresql
+
+# Number of records per (dimension, label), a `None` label is a missing value
+DimensionCounts = dict[CensusDimension, list[tuple[str | None, int]]]
+
+
+def get_counter_deltas(
+    *, added: Sequence[Any] = (), removed: Sequence[Any] = ()
+) -> Counter[tuple[str, str]]:
+    """
+    Compute the changes to apply to counters when records are added or removed.
+
+    Args:
+        added (Sequence[Any]): Records, or rows, having been created.
+        removed (Sequence[Any]): Records, or rows, having been deleted.
+
+    Returns:
+        Counter[tuple[str, str]]: Count changes keyed by (dimension, label).
+    """
+    deltas: Counter[tuple[str, str]] = Counter()
+    for dimension in CensusDimension:
+        for item in added:
+            deltas[dimension.value, getattr(item, dimension.value) or ""] += 1
+        for item in removed:
+            deltas[dimension.value, getattr(item, dimension.value) or ""] -= 1
+    return deltas
+
+
+async def apply_counter_deltas(
+    *, session: AsyncSession, deltas: Counter[tuple[str, str]]
+) -> None:
+    # Sorting rows keeps lock ordering consistent between concurrent transactions
+    rows = [
+        {"dimension": dimension, "label": label, "count": count}
+        for (dimension, label), count in sorted(deltas.items())
+        if count
+    ]
+    if not rows:
+        return
+
+    statement = insert(session=session, table=CensusCounter).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[CensusCounter.dimension, CensusCounter.label],
+        set_={"count": CensusCounter.count + statement.excluded.count},
+    )
+    await session.exec(statement)
+
+
+async def get_counters(*, session: AsyncSession) -> DimensionCounts:
+    counts: DimensionCounts = defaultdict(list)
+    results = await session.exec(select(CensusCounter).where(CensusCounter.count > 0))
+    for counter in results.all():
+        counts[CensusDimension(counter.dimension)].append(
+            (counter.label or None, counter.count)
+        )
+    return counts
+
+
+async def lock_counters(*, session: AsyncSession) -> None:
+    """
+    Keep ingest from updating counters until the session's transaction ends.
+
+    Counts meant to replace the counters must be read after taking this lock, in
+    the same transaction, so no ingest can commit a delta they do not include.
+
+    Args:
+        session (AsyncSession): Session to use, the lock is held until commit.
+    """
+    if is_postgresql(session=session):
+        connection = await session.connection()
+        await connection.execute(text("LOCK TABLE censuscounter IN EXCLUSIVE MODE"))
+
+
+async def replace_counters(*, session: AsyncSession, counts: DimensionCounts) -> int:
+    """
+    Replace all counters with the given counts, without committing.
+
+    Args:
+        session (AsyncSession): Session to use, holding `lock_counters` since the
+            counts were read.
+        counts (DimensionCounts): Number of records per dimension and label.
+
+    Returns:
+        int: The number of counters written.
+    """
+    await session.exec(delete(CensusCounter))
+
+    deltas: Counter[tuple[str, str]] = Counter()
+    for dimension, values in counts.items():
+        for label, count in values:
+            deltas[dimension.value, label or ""] += count
+    await apply_counter_deltas(session=session, deltas=deltas)
+
+    return sum(1 for count in deltas.values() if count)
+
+
+async def snapshot_counters(*, session: AsyncSession, day: date) -> int:
+    """
+    Store the current counters as the distribution of a day, without committing.
+
+    The snapshot is copied from the maintained counters, its cost depends on the
+    number of distinct labels, not on the number of records. Taking it again the
+    same day replaces it.
+
+    Args:
+        session (AsyncSession): Session to use.
+        day (date): Day the snapshot is stored for.
+
+    Returns:
+        int: The number of daily counters written.
+    """
+    await session.exec(
+        delete(CensusDailyCounter).where(col(CensusDailyCounter.day) == day)
+    )
+    current = select(
+        CensusCounter.dimension, literal(day), CensusCounter.label, CensusCounter.count
+    ).where(CensusCounter.count > 0)
+    # The row count of INSERT ... SELECT is not reported by every driver
+    result = await session.exec(
+        insert(session=session, table=CensusDailyCounter)
+        .from_select(["dimension", "day", "label", "count"], current)
+        .returning(col(CensusDailyCounter.label))
+    )
+    return len(result.all())
+
+
+async def get_daily_counts(
+    *, session: AsyncSession, dimension: CensusDimension, since: date, until: date
+) -> dict[date, list[tuple[str | None, int]]]:
+    counts: dict[date, list[tuple[str | None, int]]] = defaultdict(list)
+    results = await session.exec(
+        select(CensusDailyCounter)
+        .where(
+            CensusDailyCounter.dimension == dimension.value,
+            col(CensusDailyCounter.day) >= since,
+            col(CensusDailyCounter.day) <= until,
+        )
+        .order_by(col(CensusDailyCounter.day))
+    )
+    for counter in results.all():
+        counts[counter.day].append((counter.label or None, counter.count))
+    return counts
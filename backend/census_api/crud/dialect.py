@@ -0,0 +1,51 @@
+import zlib
+from typing import Any
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+def is_postgresql(*, session: AsyncSession) -> bool:
+    return session.get_bind().dialect.name == "postgresql"
+
+
+def insert(*, session: AsyncSession, table: Any) -> postgresql.Insert | sqlite.Insert:
+    """
+    Return an INSERT statement supporting `ON CONFLICT` for the session's dialect.
+
+    PostgreSQL is used in production while SQLite is used by the test suite, both
+    support the same upsert semantics through their own dialect constructs.
+
+    Args:
+        session (AsyncSession): Session the statement will be executed with.
+        table (Any): Model or table to insert into.
+
+    Returns:
+        postgresql.Insert | sqlite.Insert: The dialect specific INSERT statement.
+    """
+    if is_postgresql(session=session):
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+async def try_advisory_xact_lock(*, session: AsyncSession, name: str) -> bool:
+    """
+    Try to take a lock shared by all processes, held until the transaction ends.
+
+    PostgreSQL advisory locks are used, SQLite databases are not shared between
+    processes and the lock is always taken.
+
+    Args:
+        session (AsyncSession): Session whose transaction holds the lock.
+        name (str): Name of the lock.
+
+    Returns:
+        bool: True if the lock was taken, False if another transaction holds it.
+    """
+    if not is_postgresql(session=session):
+        return True
+    result = await session.exec(
+        select(func.pg_try_advisory_xact_lock(zlib.crc32(name.encode())))
+    )
+    return bool(result.one())
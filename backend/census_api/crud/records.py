@@ -1,128 +1,476 @@
 import logging
-from collections.abc import Sequence
-from datetime import datetime, timedelta
+from collections import Counter
+from collections.abc import AsyncIterator, Mapping, Sequence
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
 
-from sqlmodel import delete, select, text
+from sqlalchemy import RowMapping, false, true, union_all
+from sqlmodel import col, delete, func, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..core.config import settings
-from ..models import CensusRecord, CensusSummaries, CensusSummary
+from ..enums import CensusDimension, CensusRecordEvent
+from ..models import (
+    CensusHistory,
+    CensusHistoryPoint,
+    CensusRecord,
+    CensusRecordUpdate,
+    CensusSummaries,
+    CensusSummary,
+)
+from .counters import (
+    DimensionCounts,
+    apply_counter_deltas,
+    get_counter_deltas,
+    get_counters,
+    get_daily_counts,
+    lock_counters,
+    replace_counters,
+)
+from .dialect import insert, is_postgresql
+
+SUMMARY_TOP_ITEMS = 5
+
+
+async def delete_expired_records(
+    *, session: AsyncSession, start_time: datetime, batch_size: int | None = None
+) -> int:
+    """
+    Delete records without updates for longer than the retention period.
+
+    Records are deleted in batches, each in its own transaction, to avoid holding
+    locks on a large number of rows. Rows locked by an ingest are skipped.
 
+    Args:
+        session (AsyncSession): Session to use.
+        start_time (datetime): Time the retention period is computed from.
+        batch_size (int | None): Records per batch, `RETENTION_BATCH_SIZE` if None.
 
-async def delete_expired_records(*, session: AsyncSession, start_time: datetime) -> int:
+    Returns:
+        int: The number of records deleted.
+    """
     cut_off = start_time - timedelta(days=settings.RECORD_RETENTION)
-    result = await session.exec(
-        delete(CensusRecord).where(CensusRecord.updated_at < cut_off)
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    expired = (
+        select(CensusRecord.deployment_id)
+        .where(CensusRecord.updated_at < cut_off)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
     )
-    await session.commit()
 
-    logging.info(f"deleted {result.rowcount} expired census records")
-    return result.rowcount
+    count = 0
+    while True:
+        result = await session.exec(
+            delete(CensusRecord)
+            .where(col(CensusRecord.deployment_id).in_(expired.scalar_subquery()))
+            .returning(
+                col(CensusRecord.version),
+                col(CensusRecord.python_version),
+                col(CensusRecord.country),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        deleted = result.all()
+        await apply_counter_deltas(
+            session=session, deltas=get_counter_deltas(removed=deleted)
+        )
+        await session.commit()
 
+        count += len(deleted)
+        if len(deleted) < batch_size:
+            break
+
+    logging.info(f"deleted {count} expired census records")
+    return count
 
-async def get_record_for_update(
-    *, session: AsyncSession, deployment_id: str
-) -> CensusRecord | None:
-    statement = (
-        select(CensusRecord)
-        .where(CensusRecord.deployment_id == deployment_id)
-        .with_for_update()
-    )
-    results = await session.exec(statement=statement)
-    return results.first()
 
+def _expire_loaded_record(*, session: AsyncSession, deployment_id: str) -> None:
+    # Records are written with core statements, bypassing the identity map
+    key = session.sync_session.identity_key(CensusRecord, deployment_id)
+    if (instance := session.sync_session.identity_map.get(key)) is not None:
+        session.expire(instance)
 
-async def create_record(  # noqa: PLR0913
+
+@dataclass(frozen=True)
+class UpsertResult:
+    record: CensusRecord  # State of the record after the report
+    previous: CensusRecord | None  # State of the record before, None if created
+    event: CensusRecordEvent | None  # None if the report was rate limited
+
+
+async def upsert_records(
     *,
     session: AsyncSession,
-    deployment_id: str,
-    version: str,
-    python_version: str | None,
-    country: str | None,
+    records: Sequence[CensusRecordUpdate],
+    countries: Mapping[str, str | None] | None = None,
     now: datetime,
-) -> CensusRecord:
-    db_record = CensusRecord(
-        deployment_id=deployment_id,
-        version=version,
-        python_version=python_version,
-        country=country,
-        created_at=now,
-        updated_at=now,
+) -> dict[str, UpsertResult]:
+    """
+    Create or update records, except those updated within the rate limit.
+
+    All records are written with a single multi-row statement and transaction,
+    countries included. On PostgreSQL, the previous state of the records is read by
+    the same statement, the SQLite variant needs an extra query to read it.
+
+    Args:
+        session (AsyncSession): Session to use, it is committed.
+        records (Sequence[CensusRecordUpdate]): Reports, with unique deployment IDs.
+        countries (Mapping[str, str | None] | None): Country of the reports by
+            deployment ID, reports missing from it are written without a country.
+        now (datetime): Time of the reports.
+
+    Returns:
+        dict[str, UpsertResult]: The records with their previous state and the
+            event they led to, by deployment ID.
+    """
+    if not records:
+        return {}
+
+    countries = countries or {}
+    table = CensusRecord.__table__  # type: ignore[attr-defined]
+    # Sorting rows keeps lock ordering consistent between concurrent transactions
+    statement = insert(session=session, table=CensusRecord).values(
+        [
+            {
+                "deployment_id": record.deployment_id,
+                "version": record.version,
+                "python_version": record.python_version,
+                "country": countries.get(record.deployment_id),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for record in sorted(records, key=lambda r: r.deployment_id)
+        ]
+    )
+    upsert = statement.on_conflict_do_update(
+        index_elements=[CensusRecord.deployment_id],
+        set_={
+            "version": statement.excluded.version,
+            "python_version": statement.excluded.python_version,
+            "country": statement.excluded.country,
+            "updated_at": statement.excluded.updated_at,
+        },
+        where=(
+            col(CensusRecord.updated_at) <= now - timedelta(seconds=settings.RATE_LIMIT)
+        ),
+    ).returning(*table.columns)
+    current = select(*table.columns).where(
+        col(CensusRecord.deployment_id).in_([r.deployment_id for r in records])
+    )
+
+    if is_postgresql(session=session):
+        # All parts of the statement see the table as it was before the upsert
+        previous_cte = current.cte("previous")
+        upserted_cte = upsert.cte("upserted")
+        connection = await session.connection()
+        result = await connection.execute(
+            union_all(
+                select(false().label("upserted"), *previous_cte.columns),
+                select(true().label("upserted"), *upserted_cte.columns),
+            )
+        )
+        rows = result.mappings().all()
+        previous_rows = [r for r in rows if not r["upserted"]]
+        upserted_rows = [r for r in rows if r["upserted"]]
+    else:
+        previous_rows = list((await session.exec(current)).mappings().all())
+        upserted_rows = list((await session.exec(upsert)).mappings().all())
+
+    previous = {
+        r["deployment_id"]: CensusRecord.model_validate(r) for r in previous_rows
+    }
+    upserted = {
+        r["deployment_id"]: CensusRecord.model_validate(r) for r in upserted_rows
+    }
+    for deployment_id in upserted:
+        _expire_loaded_record(session=session, deployment_id=deployment_id)
+    await apply_counter_deltas(
+        session=session,
+        deltas=get_counter_deltas(
+            added=list(upserted.values()),
+            removed=[previous[i] for i in upserted if i in previous],
+        ),
     )
-    session.add(db_record)
     await session.commit()
-    await session.refresh(db_record)
-    return db_record
 
+    # Records created by concurrent reports after the statement started
+    if missing := [
+        r.deployment_id
+        for r in records
+        if r.deployment_id not in upserted and r.deployment_id not in previous
+    ]:
+        result = await session.exec(
+            select(*table.columns).where(col(CensusRecord.deployment_id).in_(missing))
+        )
+        for row in result.mappings().all():
+            previous[row["deployment_id"]] = CensusRecord.model_validate(row)
 
-async def update_record(  # noqa: PLR0913
+    results = {}
+    for record in records:
+        deployment_id = record.deployment_id
+        if deployment_id in upserted:
+            results[deployment_id] = UpsertResult(
+                record=upserted[deployment_id],
+                previous=previous.get(deployment_id),
+                event=(
+                    CensusRecordEvent.UPDATED
+                    if deployment_id in previous
+                    else CensusRecordEvent.CREATED
+                ),
+            )
+        else:
+            results[deployment_id] = UpsertResult(
+                record=previous[deployment_id],
+                previous=previous[deployment_id],
+                event=None,
+            )
+    return results
+
+
+async def upsert_record(  # noqa: PLR0913
     *,
     session: AsyncSession,
-    db_record: CensusRecord,
+    deployment_id: str,
     version: str,
     python_version: str | None,
-    country: str | None,
+    country: str | None = None,
     now: datetime,
-) -> CensusRecord:
-    db_record.version = version
-    db_record.python_version = python_version
-    db_record.country = country
-    db_record.updated_at = now
-    session.add(db_record)
-    await session.commit()
-    await session.refresh(db_record)
-    return db_record
+) -> UpsertResult:
+    """
+    Create or update a record, unless it has been updated within the rate limit.
+
+    Args:
+        session (AsyncSession): Session to use, it is committed.
+        deployment_id (str): Deployment ID of the record.
+        version (str): Version reported by the deployment.
+        python_version (str | None): Python version reported by the deployment.
+        country (str | None): Country the report was sent from, if known.
+        now (datetime): Time of the report.
+
+    Returns:
+        UpsertResult: The record with its previous state and the event it led to.
+    """
+    results = await upsert_records(
+        session=session,
+        records=[
+            CensusRecordUpdate(
+                deployment_id=deployment_id,
+                version=version,
+                python_version=python_version,
+            )
+        ],
+        countries={deployment_id: country},
+        now=now,
+    )
+    return results[deployment_id]
 
 
 async def get_records(
-    *, session: AsyncSession, offset: int, limit: int
+    *, session: AsyncSession, offset: int, limit: int, after: str | None = None
 ) -> Sequence[CensusRecord]:
-    result = await session.exec(select(CensusRecord).offset(offset).limit(limit))
+    """
+    Return a page of records ordered by deployment ID.
+
+    Pages are best walked with `after`, which seeks through the primary key index,
+    while `offset` has to skip over all previous records.
+
+    Args:
+        session (AsyncSession): Session to use.
+        offset (int): Number of records to skip.
+        limit (int): Maximum number of records to return.
+        after (str | None): Only return records after this deployment ID.
+
+    Returns:
+        Sequence[CensusRecord]: The records of the page.
+    """
+    statement = select(CensusRecord).order_by(col(CensusRecord.deployment_id))
+    if after is not None:
+        statement = statement.where(col(CensusRecord.deployment_id) > after)
+    result = await session.exec(statement.offset(offset).limit(limit))
     return result.all()
 
 
-async def get_summary(*, session: AsyncSession) -> CensusSummaries:
-    summaries: dict[str, list[CensusSummary]] = {
-        "version": [],
-        "python_version": [],
-        "country": [],
+async def stream_records(
+    *, session: AsyncSession, batch_size: int
+) -> AsyncIterator[Sequence[RowMapping]]:
+    """
+    Yield all records, ordered by deployment ID, in batches of rows.
+
+    Rows are read through a server-side cursor and are not loaded as models, so
+    memory usage does not depend on the number of records.
+
+    Args:
+        session (AsyncSession): Session to use, busy until all batches are read.
+        batch_size (int): Number of rows to fetch from the database at once.
+
+    Yields:
+        Sequence[RowMapping]: Rows of records, keyed by column name.
+    """
+    table = CensusRecord.__table__  # type: ignore[attr-defined]
+    statement = (
+        select(table)
+        .order_by(table.c.deployment_id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await session.stream(statement)
+    async for rows in result.mappings().partitions():
+        yield rows
+
+
+async def count_records(*, session: AsyncSession) -> DimensionCounts:
+    """
+    Count records per label of each dimension, with a single scan of the table.
+
+    PostgreSQL counts all dimensions at once with `GROUPING SETS`. SQLite does not
+    support them, records are grouped by all dimensions together and the counts of
+    each dimension are summed from these groups.
+
+    Args:
+        session (AsyncSession): Session to use.
+
+    Returns:
+        DimensionCounts: Number of records per dimension and label.
+    """
+    dimensions = list(CensusDimension)
+    columns = [getattr(CensusRecord, dimension.value) for dimension in dimensions]
+    totals: dict[CensusDimension, Counter[str | None]] = {
+        dimension: Counter() for dimension in dimensions
     }
 
-    for item, values in summaries.items():
-        query = f"""
-WITH item_counts AS (
-    SELECT {item}, COUNT(*) AS item_count FROM censusrecord GROUP BY {item}
-),
-ranked_items AS (
-    SELECT {item}, item_count,
-    ROW_NUMBER() OVER (ORDER BY item_count DESC) AS rn FROM item_counts
-),
-top_items AS (
-    SELECT {item}, item_count FROM ranked_items WHERE rn <= 5
-    UNION ALL
-    SELECT 'other' AS {item},
-    SUM(item_count) AS item_count FROM ranked_items WHERE rn > 5
-),
-total_count AS (
-    SELECT SUM(item_count) AS total_count FROM item_counts
-)
-SELECT ti.{item}, ti.item_count,
-ROUND(100.0 * ti.item_count / tc.total_count, 2) AS percentage
-FROM top_items ti, total_count tc ORDER BY percentage DESC;
-"""
-        result = await session.exec(statement=text(query))
-        for r in result.fetchall():
-            label: str = r[0] or "Unknown"
-            count: int = 0 if not r[1] else r[1]
-            percentage: float = 0 if not r[2] else r[2]
-
-            if label == "other" and count == 0:
-                continue
-
-            values.append(
-                CensusSummary(label=label, count=count, percentage=percentage)
+    if is_postgresql(session=session):
+        # GROUPING() sets the bit of each column left out of a row's grouping set
+        all_bits = (1 << len(columns)) - 1
+        by_mask = {
+            all_bits & ~(1 << (len(columns) - 1 - i)): i for i in range(len(dimensions))
+        }
+        result = await session.exec(
+            select(func.grouping(*columns), func.count(), *columns).group_by(
+                func.grouping_sets(*columns)
+            )
+        )
+        for mask, count, *labels in result.all():
+            i = by_mask[mask]
+            totals[dimensions[i]][labels[i]] += count
+    else:
+        result = await session.exec(select(func.count(), *columns).group_by(*columns))
+        for count, *labels in result.all():
+            for dimension, label in zip(dimensions, labels, strict=True):
+                totals[dimension][label] += count
+
+    return {dimension: list(totals[dimension].items()) for dimension in dimensions}
+
+
+async def rebuild_counters(*, session: AsyncSession) -> int:
+    # Counting after the lock keeps deltas committed meanwhile from being lost
+    await lock_counters(session=session)
+    counts = await count_records(session=session)
+    written = await replace_counters(session=session, counts=counts)
+    await session.commit()
+
+    logging.info(f"rebuilt {written} census counters")
+    return written
+
+
+def _percentage(count: int, total: int) -> float:
+    # Round half up, as PostgreSQL does for numerics
+    value = Decimal(100 * count) / Decimal(total)
+    return float(value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def _build_summary(counts: list[tuple[str | None, int]]) -> list[CensusSummary]:
+    total = sum(count for _, count in counts)
+    if not total:
+        return []
+
+    # Higher counts first, ties broken by label to keep the output stable
+    ranked = sorted(counts, key=lambda c: (-c[1], c[0] or ""))
+    summary = [
+        CensusSummary(
+            label=label or "Unknown",
+            count=count,
+            percentage=_percentage(count, total),
+        )
+        for label, count in ranked[:SUMMARY_TOP_ITEMS]
+    ]
+
+    # Consider other to always be last
+    other = sum(count for _, count in ranked[SUMMARY_TOP_ITEMS:])
+    if other:
+        summary.append(
+            CensusSummary(
+                label="other", count=other, percentage=_percentage(other, total)
             )
-        # Sort by count reverse (higher to lower) and consider other always to be last
-        values.sort(key=lambda k: k.count if k.label != "other" else 0, reverse=True)
+        )
+
+    return summary
+
+
+def _build_summaries(counts: DimensionCounts) -> CensusSummaries:
+    return CensusSummaries(
+        **{
+            dimension.value: _build_summary(counts.get(dimension, []))
+            for dimension in CensusDimension
+        }
+    )
+
+
+async def get_summary(*, session: AsyncSession) -> CensusSummaries:
+    """
+    Return the summaries of all records using the maintained counters.
+
+    The cost of this query depends on the number of distinct labels, not on the
+    number of records.
+    """
+    return _build_summaries(await get_counters(session=session))
+
+
+async def get_summary_from_records(*, session: AsyncSession) -> CensusSummaries:
+    """
+    Return the summaries of all records by aggregating the records table.
+    """
+    return _build_summaries(await count_records(session=session))
 
-    return CensusSummaries(**summaries)
+
+async def get_summary_history(
+    *,
+    session: AsyncSession,
+    dimension: CensusDimension,
+    since: date,
+    until: date,
+    max_points: int,
+) -> CensusHistory:
+    """
+    Return the daily summaries of a dimension over a range of days.
+
+    Long ranges are downsampled to at most `max_points` points, each one being the
+    last snapshot of its interval as distributions are not summed over time.
+
+    Args:
+        session (AsyncSession): Session to use.
+        dimension (CensusDimension): Dimension to summarise.
+        since (date): First day of the range.
+        until (date): Last day of the range, included.
+        max_points (int): Maximum number of points returned.
+
+    Returns:
+        CensusHistory: The summaries, oldest first, for days with a snapshot.
+    """
+    interval = -(-((until - since).days + 1) // max_points)
+    counts = await get_daily_counts(
+        session=session, dimension=dimension, since=since, until=until
+    )
+
+    # Keep the last snapshot of each interval, intervals end on `until`
+    latest: dict[int, date] = {}
+    for day in counts:
+        latest[(until - day).days // interval] = day
+
+    return CensusHistory(
+        dimension=dimension,
+        interval=interval,
+        points=[
+            CensusHistoryPoint(day=day, summary=_build_summary(counts[day]))
+            for day in sorted(latest.values())
+        ],
+    )
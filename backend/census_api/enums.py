@@ -4,3 +4,16 @@ from enum import Enum
 class CensusRecordEvent(Enum):
     CREATED = "created"
     UPDATED = "updated"
+
+
+class CensusReportOutcome(Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    RATE_LIMITED = "rate_limited"
+    IGNORED = "ignored"
+
+
+class CensusDimension(Enum):
+    VERSION = "version"
+    PYTHON_VERSION = "python_version"
+    COUNTRY = "country"
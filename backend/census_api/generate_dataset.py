@@ -0,0 +1,171 @@
+"""
+Generate synthetic census records, to profile and test queries at scale.
+
+Usage: python -m census_api.generate_dataset [--records N] [--seed N]
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, islice
+from typing import Any
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from census_api.core.config import settings
+from census_api.core.database import async_session
+from census_api.crud.dialect import is_postgresql
+from census_api.crud.records import rebuild_counters
+from census_api.models import CensusRecord
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLUMNS = [
+    "deployment_id",
+    "version",
+    "python_version",
+    "country",
+    "created_at",
+    "updated_at",
+]
+
+# Recent releases are the most deployed, the tail of old ones is long
+VERSIONS: list[tuple[str | None, int]] = [
+    (f"1.{minor}.{patch}", weight)
+    for minor, patch, weight in [
+        (10, 0, 22), (9, 3, 18), (9, 2, 11), (9, 1, 8), (9, 0, 6), (8, 4, 7),
+        (8, 3, 5), (8, 2, 3), (8, 1, 2), (8, 0, 2), (7, 4, 3), (7, 3, 2),
+        (7, 0, 1), (6, 1, 2), (6, 0, 1), (5, 0, 1), (4, 0, 1),
+    ]
+]  # fmt: skip
+PYTHON_VERSIONS = [
+    ("3.12", 34), ("3.11", 27), ("3.10", 17), ("3.13", 9), ("3.9", 6),
+    ("3.8", 3), ("3.14", 1), (None, 3),
+]  # fmt: skip
+COUNTRIES = [
+    ("US", 21), ("DE", 12), ("FR", 8), ("GB", 7), ("NL", 6), ("BR", 5),
+    ("JP", 4), ("IN", 4), ("CH", 3), ("CA", 3), ("AU", 3), ("IT", 2),
+    ("SE", 2), ("PL", 2), ("ES", 2), ("ZA", 1), ("SG", 1), ("HK", 1),
+    ("AR", 1), ("CZ", 1), (None, 11),
+]  # fmt: skip
+MEAN_AGE = 45  # Mean time in day since the last report
+EXPIRED_RATIO = 0.08  # Share of records not updated within the retention period
+
+
+def _sampler(
+    choices: list[tuple[str | None, int]], rng: random.Random
+) -> Iterator[str | None]:
+    values = [value for value, _ in choices]
+    cum_weights = list(accumulate(weight for _, weight in choices))
+    while True:
+        yield from rng.choices(values, cum_weights=cum_weights, k=1024)
+
+
+def generate_records(
+    *, count: int, seed: int = 0, now: datetime | None = None
+) -> Iterator[dict[str, Any]]:
+    """
+    Generate records with skewed distributions of versions, countries and ages.
+
+    The same seed and time give the same records.
+
+    Args:
+        count (int): Number of records to generate.
+        seed (int): Seed of the generator.
+        now (datetime | None): Time the ages are computed from, naive times being
+            UTC ones, current time if None.
+
+    Returns:
+        Iterator[dict[str, Any]]: Records, as column values, in `COLUMNS` order.
+    """
+    # Timestamp columns hold naive UTC times
+    now = now or datetime.now(tz=timezone.utc)
+    if now.tzinfo is not None:
+        now = now.astimezone(timezone.utc).replace(tzinfo=None)
+    rng = random.Random(seed)
+    versions = _sampler(VERSIONS, rng)
+    python_versions = _sampler(PYTHON_VERSIONS, rng)
+    countries = _sampler(COUNTRIES, rng)
+
+    for i in range(count):
+        if rng.random() < EXPIRED_RATIO:
+            age = settings.RECORD_RETENTION + rng.expovariate(1 / MEAN_AGE)
+        else:
+            age = min(rng.expovariate(1 / MEAN_AGE), settings.RECORD_RETENTION - 1)
+        updated_at = now - timedelta(days=age)
+        yield {
+            "deployment_id": f"{i:08x}-{rng.getrandbits(96):024x}",
+            "version": next(versions),
+            "python_version": next(python_versions),
+            "country": next(countries),
+            "created_at": updated_at - timedelta(days=rng.expovariate(1 / 180)),
+            "updated_at": updated_at,
+        }
+
+
+async def load_records(
+    *,
+    session: AsyncSession,
+    count: int,
+    seed: int = 0,
+    now: datetime | None = None,
+    batch_size: int = 10_000,
+) -> int:
+    """
+    Bulk-load generated records, then rebuild the counters.
+
+    PostgreSQL is loaded with `COPY`, other databases with batched executemany.
+
+    Args:
+        session (AsyncSession): Session to use, it is committed.
+        count (int): Number of records to generate.
+        seed (int): Seed of the generator.
+        now (datetime | None): Time the ages are computed from, current time if None.
+        batch_size (int): Records inserted per statement, without `COPY`.
+
+    Returns:
+        int: The number of records loaded.
+    """
+    records = generate_records(count=count, seed=seed, now=now)
+    connection = await session.connection()
+
+    if is_postgresql(session=session):
+        raw = await connection.get_raw_connection()
+        driver = raw.driver_connection
+        assert driver is not None
+        async with driver.cursor() as cursor:
+            statement = f"COPY censusrecord ({', '.join(COLUMNS)}) FROM STDIN"
+            async with cursor.copy(statement) as copy:
+                for record in records:
+                    await copy.write_row([record[c] for c in COLUMNS])
+    else:
+        table = CensusRecord.__table__  # type: ignore[attr-defined]
+        while batch := list(islice(records, batch_size)):
+            await connection.execute(table.insert(), batch)
+
+    await session.commit()
+    await rebuild_counters(session=session)
+    return count
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logger.info(f"generating {args.records} census records")
+    start = time.perf_counter()
+    async with async_session() as session:
+        await load_records(session=session, count=args.records, seed=args.seed)
+    logger.info(f"census records loaded in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
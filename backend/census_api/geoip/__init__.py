@@ -0,0 +1,23 @@
+from ..core.config import settings
+from .base import CountryResolver
+from .ipinfo import IPInfoResolver
+from .local import LocalResolver
+
+ipinfo_resolver = IPInfoResolver()
+local_resolver = LocalResolver(path=settings.GEOIP_DATABASE_PATH)
+
+
+def get_resolver() -> CountryResolver:
+    if settings.GEOIP_BACKEND == "local":
+        return local_resolver
+    return ipinfo_resolver
+
+
+__all__ = [
+    "CountryResolver",
+    "IPInfoResolver",
+    "LocalResolver",
+    "get_resolver",
+    "ipinfo_resolver",
+    "local_resolver",
+]
@@ -0,0 +1,6 @@
+from ipaddress import IPv4Address, IPv6Address
+from typing import Protocol
+
+
+class CountryResolver(Protocol):
+    async def resolve(self, *, address: IPv4Address | IPv6Address) -> str | None: ...
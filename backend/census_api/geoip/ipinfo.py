@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from ipaddress import IPv4Address, IPv6Address
+
+import httpx
+
+from ..core.cache import LRUCache
+from ..core.config import settings
+from ..core.http import http_client
+from ..core.metrics import OUTBOUND_HTTP_ERRORS
+
+
+class IPInfoResolver:
+    """
+    Resolve countries using the ipinfo.io API.
+
+    Results, including IP addresses without a country, are cached and concurrent
+    resolutions of the same IP address share a single API request. Failed requests
+    are not cached.
+    """
+
+    def __init__(self, *, client: httpx.AsyncClient | None = None) -> None:
+        self.cache: LRUCache[str, str | None] = LRUCache(
+            maxsize=settings.GEOIP_CACHE_SIZE, ttl=settings.GEOIP_CACHE_TTL
+        )
+        self._client = client
+        self._lookups: dict[str, asyncio.Task[str | None]] = {}
+
+    async def _lookup(self, *, ip_address: str) -> str | None:
+        client = self._client or http_client.get()
+        try:
+            r = await client.get(
+                f"{settings.IPINFO_API_URL}{ip_address}",
+                params={"token": settings.IPINFO_TOKEN},
+            )
+            r.raise_for_status()
+        except httpx.HTTPStatusError as exc:
+            OUTBOUND_HTTP_ERRORS.labels(
+                service="ipinfo", reason=exc.response.status_code
+            ).inc()
+            logging.error(f"ipinfo lookup failure: {exc.request.url} - {exc}")
+            return None
+        except httpx.HTTPError as exc:
+            OUTBOUND_HTTP_ERRORS.labels(
+                service="ipinfo", reason=type(exc).__name__
+            ).inc()
+            logging.error(f"ipinfo lookup failure: {exc!r}")
+            return None
+
+        country_code = r.json().get("country_code", None)
+        if country_code:
+            self.cache.set(ip_address, str(country_code))
+            return str(country_code)
+
+        self.cache.set(ip_address, None, ttl=settings.GEOIP_CACHE_NEGATIVE_TTL)
+        return None
+
+    async def resolve(self, *, address: IPv4Address | IPv6Address) -> str | None:
+        if not settings.IPINFO_TOKEN:
+            logging.error("cannot use ipinfo lookup, IPINFO_TOKEN not set")
+            return None
+
+        ip_address = str(address)
+        if (entry := self.cache.get(ip_address)) is not None:
+            return entry.value
+
+        lookup = self._lookups.get(ip_address)
+        if lookup is None:
+            lookup = asyncio.create_task(self._lookup(ip_address=ip_address))
+            self._lookups[ip_address] = lookup
+            lookup.add_done_callback(lambda _: self._lookups.pop(ip_address, None))
+
+        # A cancelled request must not cancel the lookup other requests wait for
+        return await asyncio.shield(lookup)
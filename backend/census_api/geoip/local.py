@@ -0,0 +1,182 @@
+import asyncio
+import csv
+import ipaddress
+import logging
+import socket
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator, MutableSequence
+from dataclasses import dataclass
+from ipaddress import IPv4Address, IPv6Address
+from pathlib import Path
+
+from watchfiles import awatch
+
+IPAddress = IPv4Address | IPv6Address
+# IP version, first and last addresses as integers, and country code
+IPRange = tuple[int, int, int, str]
+
+
+@dataclass(frozen=True)
+class _Ranges:
+    # Sorted, non-overlapping, ranges with their country as an index of `countries`
+    starts: MutableSequence[int]
+    ends: MutableSequence[int]
+    countries: MutableSequence[int]
+
+    def lookup(self, value: int) -> int | None:
+        i = bisect_right(self.starts, value) - 1
+        if i >= 0 and value <= self.ends[i]:
+            return self.countries[i]
+        return None
+
+
+def _parse_address(value: str) -> tuple[int, int]:
+    # Much faster than `ipaddress`, which matters for databases of millions of rows
+    value = value.strip()
+    family, version = (socket.AF_INET6, 6) if ":" in value else (socket.AF_INET, 4)
+    try:
+        return version, int.from_bytes(socket.inet_pton(family, value), "big")
+    except OSError as exc:
+        raise ValueError(f"invalid IP address {value!r}") from exc
+
+
+def _parse_rows(rows: Iterable[list[str]]) -> Iterator[IPRange]:
+    """
+    Yield ranges from CSV rows.
+
+    Rows are either `start,end,country,...` like the ipinfo.io, DB-IP or IP2Location
+    Lite country files, or `network,country,...` with a network in CIDR notation.
+    Rows which cannot be parsed, such as headers, are skipped.
+    """
+    version: int
+    last_version: int
+    for row in rows:
+        try:
+            if "/" in row[0]:
+                network = ipaddress.ip_network(row[0].strip(), strict=False)
+                version = last_version = network.version
+                first = int(network.network_address)
+                last = int(network.broadcast_address)
+                country = row[1]
+            else:
+                version, first = _parse_address(row[0])
+                last_version, last = _parse_address(row[1])
+                country = row[2]
+        except (IndexError, ValueError):
+            continue
+
+        country = country.strip().upper()
+        if country and version == last_version:
+            yield version, first, last, country
+
+
+class CountryDatabase:
+    """
+    IP ranges to country mappings, held in sorted integer arrays.
+
+    IPv4 ranges use machine-sized arrays while IPv6 ranges, which do not fit in 64
+    bits, use lists of integers. Lookups are binary searches over range starts.
+    """
+
+    def __init__(self, *, ranges: Iterable[IPRange]) -> None:
+        self.countries: list[str] = []
+        indexes: dict[str, int] = {}
+        by_version: dict[int, list[tuple[int, int, int]]] = {4: [], 6: []}
+        for version, first, last, country in ranges:
+            if country not in indexes:
+                indexes[country] = len(self.countries)
+                self.countries.append(country)
+            by_version[version].append((first, last, indexes[country]))
+
+        self._ipv4 = self._build(by_version[4], starts=array("L"), ends=array("L"))
+        self._ipv6 = self._build(by_version[6], starts=[], ends=[])
+
+    @staticmethod
+    def _build(
+        ranges: list[tuple[int, int, int]],
+        *,
+        starts: MutableSequence[int],
+        ends: MutableSequence[int],
+    ) -> _Ranges:
+        countries = array("H")
+        for start, end, country in sorted(ranges):
+            starts.append(start)
+            ends.append(end)
+            countries.append(country)
+        return _Ranges(starts=starts, ends=ends, countries=countries)
+
+    @classmethod
+    def from_csv(cls, path: Path) -> "CountryDatabase":
+        with path.open(newline="") as f:
+            return cls(ranges=_parse_rows(csv.reader(f)))
+
+    def __len__(self) -> int:
+        return len(self._ipv4.starts) + len(self._ipv6.starts)
+
+    def lookup(self, address: IPAddress) -> str | None:
+        ranges = self._ipv4 if address.version == 4 else self._ipv6  # noqa: PLR2004
+        index = ranges.lookup(int(address))
+        return None if index is None else self.countries[index]
+
+
+class LocalResolver:
+    """
+    Resolve countries using a local IP ranges to country CSV file.
+
+    The file is loaded in memory and reloaded when it changes, the previous database
+    keeps serving lookups while a new one is being loaded.
+    """
+
+    def __init__(self, *, path: str) -> None:
+        self.path = Path(path).absolute()
+        self.database: CountryDatabase | None = None
+        self._mtime: int | None = None
+
+    def _load_if_changed(self) -> tuple[CountryDatabase, int] | None:
+        mtime = self.path.stat().st_mtime_ns
+        if mtime == self._mtime:
+            return None
+        return CountryDatabase.from_csv(self.path), mtime
+
+    async def load(self) -> bool:
+        """
+        Load the database if the file has changed since it was last loaded.
+
+        Returns:
+            bool: Whether a new database has been loaded.
+        """
+        try:
+            # Parsing a full database takes a while, keep the event loop responsive
+            loaded = await asyncio.to_thread(self._load_if_changed)
+        except (OSError, ValueError, csv.Error) as exc:
+            logging.error(f"cannot load geoip database: {exc}")
+            return False
+        if loaded is None:
+            return False
+
+        database, self._mtime = loaded
+        self.database = database
+        logging.info(f"loaded {len(database)} geoip ranges from {self.path}")
+        return True
+
+    async def watch(self) -> None:
+        """
+        Reload the database whenever its file is changed, until cancelled.
+
+        The parent directory is watched so that files replaced by a rename, which is
+        how databases are usually updated atomically, are noticed as well. Its
+        subdirectories are not.
+        """
+        try:
+            async for changes in awatch(self.path.parent, recursive=False):
+                if any(Path(path) == self.path for _, path in changes):
+                    await self.load()
+        except OSError as exc:
+            logging.error(f"cannot watch geoip database: {exc}")
+
+    async def resolve(self, *, address: IPAddress) -> str | None:
+        if self.database is None:
+            logging.error("cannot use local geoip lookup, database not loaded")
+            return None
+        return self.database.lookup(address)
@@ -1,17 +1,93 @@
+import asyncio
+import contextlib
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 
 from .api.main import api_router
+from .api.routes import metrics
 from .core.config import settings
+from .core.http import http_client
+from .core.metrics import MetricsMiddleware
+from .core.tasks import run_periodically
+from .geoip import local_resolver
+from .notifications import notification_dispatcher
+from .services.history import run_rollup
+from .services.records import report_buffer
+from .services.retention import run_retention
+from .services.snapshot import run_snapshot
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
 
 
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncGenerator[None, None]:
+    http_client.get()
+    notification_dispatcher.start()
+    if settings.INGEST_BUFFER:
+        report_buffer.start()
+
+    # Every worker schedules the tasks, exclusive ones only run in one at a time
+    tasks: list[asyncio.Task[None]] = []
+    if settings.GEOIP_BACKEND == "local":
+        await local_resolver.load()
+        if settings.GEOIP_DATABASE_RELOAD:
+            tasks.append(asyncio.create_task(local_resolver.watch()))
+    if settings.RETENTION_INTERVAL > 0:
+        tasks.append(
+            asyncio.create_task(
+                run_periodically(
+                    name="retention",
+                    interval=settings.RETENTION_INTERVAL,
+                    func=run_retention,
+                )
+            )
+        )
+    if settings.ROLLUP_INTERVAL > 0:
+        tasks.append(
+            asyncio.create_task(
+                run_periodically(
+                    name="rollup",
+                    interval=settings.ROLLUP_INTERVAL,
+                    func=run_rollup,
+                    exclusive=True,
+                )
+            )
+        )
+    if settings.SUMMARY_SNAPSHOT_DIR and settings.SUMMARY_SNAPSHOT_INTERVAL > 0:
+        tasks.append(
+            asyncio.create_task(
+                run_periodically(
+                    name="summary snapshot",
+                    interval=settings.SUMMARY_SNAPSHOT_INTERVAL,
+                    func=run_snapshot,
+                    exclusive=True,
+                )
+            )
+        )
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    # Buffered reports are written first, they may lead to notifications
+    await report_buffer.stop(timeout=settings.INGEST_BUFFER_SHUTDOWN_TIMEOUT)
+    await notification_dispatcher.stop(timeout=settings.NOTIFICATION_SHUTDOWN_TIMEOUT)
+    await http_client.aclose()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
+    lifespan=lifespan,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
 )
@@ -28,4 +104,15 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Responses already encoded, such as compressed exports, are left as they are
+if settings.RESPONSE_GZIP_MIN_SIZE > 0:
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=settings.RESPONSE_GZIP_MIN_SIZE,
+        compresslevel=6,  # Starlette defaults to 9, much slower for little gain
+    )
+
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
+app.include_router(metrics.router, tags=["metrics"])
@@ -1,18 +1,20 @@
-from datetime import datetime
+from datetime import date, datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, IPvAnyAddress
 from sqlmodel import Field, SQLModel
 
+from .enums import CensusDimension, CensusReportOutcome
+
 
 class CensusRecordBase(SQLModel):
-    deployment_id: str = Field(primary_key=True, index=True)
+    deployment_id: str = Field(primary_key=True)
     version: str
     python_version: str | None
 
 
 class CensusRecord(CensusRecordBase, table=True):
     created_at: datetime
-    updated_at: datetime
+    updated_at: datetime = Field(index=True)
     country: str | None
 
 
@@ -20,6 +22,31 @@ class CensusRecordUpdate(CensusRecordBase):
     pass
 
 
+class CensusRecordBatchItem(CensusRecordUpdate):
+    # Address the report was received from, only trusted from relays
+    ip_address: IPvAnyAddress | None = None
+
+
+class CensusRecordBatchResult(BaseModel):
+    deployment_id: str
+    outcome: CensusReportOutcome
+    record: CensusRecord | None
+
+
+class CensusCounter(SQLModel, table=True):
+    dimension: str = Field(primary_key=True)
+    label: str = Field(primary_key=True)
+    count: int = 0
+
+
+class CensusDailyCounter(SQLModel, table=True):
+    # Keyed by dimension first, histories are read one dimension at a time
+    dimension: str = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+    label: str = Field(primary_key=True)
+    count: int = 0
+
+
 class CensusSummary(BaseModel):
     label: str
     count: int
@@ -30,3 +57,20 @@ class CensusSummaries(BaseModel):
     version: list[CensusSummary]
     python_version: list[CensusSummary]
     country: list[CensusSummary]
+
+
+class CensusSummarySnapshot(BaseModel):
+    generated_at: datetime
+    expires_at: datetime  # Time after which readers should query the API instead
+    summary: CensusSummaries
+
+
+class CensusHistoryPoint(BaseModel):
+    day: date
+    summary: list[CensusSummary]
+
+
+class CensusHistory(BaseModel):
+    dimension: CensusDimension
+    interval: int  # Number of days between two points
+    points: list[CensusHistoryPoint]
@@ -1,5 +1,7 @@
-from .base import Notifier
+from ..core.config import settings
+from .base import Notification, Notifier
 from .discord import DiscordNotifier
+from .dispatcher import NotificationDispatcher
 
 _discord_notifier = DiscordNotifier()
 
@@ -8,4 +10,16 @@ def get_notifiers() -> list[Notifier]:
     return [_discord_notifier]
 
 
-__all__ = ["Notifier", "get_notifiers"]
+notification_dispatcher = NotificationDispatcher(
+    notifiers=get_notifiers(),
+    maxsize=settings.NOTIFICATION_QUEUE_SIZE,
+    batch_size=settings.NOTIFICATION_BATCH_SIZE,
+)
+
+__all__ = [
+    "Notification",
+    "NotificationDispatcher",
+    "Notifier",
+    "get_notifiers",
+    "notification_dispatcher",
+]
@@ -1,8 +1,16 @@
+from collections.abc import Sequence
+from dataclasses import dataclass
 from typing import Protocol
 
 from ..enums import CensusRecordEvent
 from ..models import CensusRecord
 
 
+@dataclass(frozen=True)
+class Notification:
+    event: CensusRecordEvent
+    record: CensusRecord
+
+
 class Notifier(Protocol):
-    async def send(self, *, event: CensusRecordEvent, record: CensusRecord) -> None: ...
+    async def send(self, *, notifications: Sequence[Notification]) -> None: ...
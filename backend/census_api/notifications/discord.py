@@ -1,43 +1,38 @@
+import asyncio
 import logging
 import time
+from collections.abc import Sequence
+from typing import Any
 
 import flag
 import httpx
 
 from ..core.config import settings
+from ..core.http import http_client
+from ..core.metrics import OUTBOUND_HTTP_ERRORS
 from ..enums import CensusRecordEvent
-from ..models import CensusRecord
+from .base import Notification
 
 _DEDUP_WINDOW = 60  # seconds
+_MAX_EMBEDS = 10  # embeds per webhook call allowed by Discord
+_MAX_ATTEMPTS = 3  # webhook calls for a batch when being rate limited
 
 
 class DiscordNotifier:
     def __init__(self) -> None:
         self._last_notified: dict[str, float] = {}
 
-    async def send(self, *, event: CensusRecordEvent, record: CensusRecord) -> None:
-        if not settings.DISCORD_WEBHOOK_URL:
-            logging.info(
-                "unable to process discord notification, DISCORD_WEBHOOK_URL is not set"
-            )
-            return
-
+    def _is_duplicate(self, *, deployment_id: str, now: float) -> bool:
         # Skip duplicate notifications for the same deployment within the dedup window
-        now = time.monotonic()
-        last = self._last_notified.get(record.deployment_id, 0)
+        last = self._last_notified.get(deployment_id, 0)
         if now - last < _DEDUP_WINDOW:
-            logging.info(
-                f"skipping duplicate discord notification for {record.deployment_id}"
-            )
-            return
-        self._last_notified[record.deployment_id] = now
-
-        # Clean up stale entries
-        for key in [
-            k for k, v in self._last_notified.items() if now - v >= _DEDUP_WINDOW
-        ]:
-            del self._last_notified[key]
+            logging.info(f"skipping duplicate discord notification for {deployment_id}")
+            return True
+        self._last_notified[deployment_id] = now
+        return False
 
+    def _build_embed(self, *, notification: Notification) -> dict[str, Any] | None:
+        event, record = notification.event, notification.record
         match event:
             case CensusRecordEvent.CREATED:
                 title = "New instance of Peering Manager recorded"
@@ -48,64 +43,108 @@ class DiscordNotifier:
                     f"unable to process discord notification for record "
                     f"{record} and event {event}"
                 )
-                return
+                return None
 
         if record.country:
             country_flag = flag.flag(countrycode=record.country)
         else:
             country_flag = ":question:"
 
-        webhook_body = {
-            "username": settings.DISCORD_WEBHOOK_USERNAME,
-            "embeds": [
+        return {
+            "title": title,
+            "url": settings.server_host,
+            "color": 16230444,
+            "fields": [
+                {
+                    "name": "Deployment ID",
+                    "value": f"`{record.deployment_id}`",
+                    "inline": True,
+                },
+                {
+                    "name": "Version",
+                    "value": f"`{record.version}`",
+                    "inline": True,
+                },
+                {
+                    "name": "Python version",
+                    "value": f"`{record.python_version}`",
+                    "inline": True,
+                },
+                {
+                    "name": "Country",
+                    "value": f"`{record.country or 'Unknown'}` {country_flag}",
+                    "inline": True,
+                },
+                {
+                    "name": "Created at",
+                    "value": f"`{record.created_at}`",
+                    "inline": True,
+                },
                 {
-                    "title": title,
-                    "url": settings.server_host,
-                    "color": 16230444,
-                    "fields": [
-                        {
-                            "name": "Deployment ID",
-                            "value": f"`{record.deployment_id}`",
-                            "inline": True,
-                        },
-                        {
-                            "name": "Version",
-                            "value": f"`{record.version}`",
-                            "inline": True,
-                        },
-                        {
-                            "name": "Python version",
-                            "value": f"`{record.python_version}`",
-                            "inline": True,
-                        },
-                        {
-                            "name": "Country",
-                            "value": (
-                                f"`{record.country or 'Unknown'}` {country_flag}"
-                            ),
-                            "inline": True,
-                        },
-                        {
-                            "name": "Created at",
-                            "value": f"`{record.created_at}`",
-                            "inline": True,
-                        },
-                        {
-                            "name": "Updated at",
-                            "value": f"`{record.updated_at}`",
-                            "inline": True,
-                        },
-                    ],
-                }
+                    "name": "Updated at",
+                    "value": f"`{record.updated_at}`",
+                    "inline": True,
+                },
             ],
         }
 
-        async with httpx.AsyncClient() as client:
-            r = await client.post(settings.DISCORD_WEBHOOK_URL, json=webhook_body)
+    async def _post(self, *, embeds: list[dict[str, Any]]) -> None:
+        webhook_body = {"username": settings.DISCORD_WEBHOOK_USERNAME, "embeds": embeds}
+
+        for attempt in range(1, _MAX_ATTEMPTS + 1):
             try:
-                r.raise_for_status()
-            except httpx.HTTPStatusError as exc:
-                logging.error(
-                    f"discord notification failure: {exc.request.url} - {exc}"
+                r = await http_client.get().post(
+                    settings.DISCORD_WEBHOOK_URL, json=webhook_body
                 )
-                raise exc
+            except httpx.HTTPError as exc:
+                OUTBOUND_HTTP_ERRORS.labels(
+                    service="discord", reason=type(exc).__name__
+                ).inc()
+                logging.error(f"discord notification failure: {exc!r}")
+                return
+            if (
+                r.status_code != httpx.codes.TOO_MANY_REQUESTS
+                or attempt == _MAX_ATTEMPTS
+            ):
+                break
+
+            # Discord tells how long to wait, in seconds, before trying again
+            try:
+                retry_after = float(r.json()["retry_after"])
+            except (ValueError, KeyError, TypeError):
+                retry_after = float(r.headers.get("retry-after", 1))
+            logging.warning(f"discord rate limited, retrying in {retry_after}s")
+            await asyncio.sleep(retry_after)
+
+        try:
+            r.raise_for_status()
+        except httpx.HTTPStatusError as exc:
+            OUTBOUND_HTTP_ERRORS.labels(
+                service="discord", reason=exc.response.status_code
+            ).inc()
+            logging.error(f"discord notification failure: {exc.request.url} - {exc}")
+
+    async def send(self, *, notifications: Sequence[Notification]) -> None:
+        if not settings.DISCORD_WEBHOOK_URL:
+            logging.info(
+                "unable to process discord notification, DISCORD_WEBHOOK_URL is not set"
+            )
+            return
+
+        now = time.monotonic()
+        embeds = []
+        for notification in notifications:
+            deployment_id = notification.record.deployment_id
+            if self._is_duplicate(deployment_id=deployment_id, now=now):
+                continue
+            if (embed := self._build_embed(notification=notification)) is not None:
+                embeds.append(embed)
+
+        # Clean up stale entries
+        for key in [
+            k for k, v in self._last_notified.items() if now - v >= _DEDUP_WINDOW
+        ]:
+            del self._last_notified[key]
+
+        for i in range(0, len(embeds), _MAX_EMBEDS):
+            await self._post(embeds=embeds[i : i + _MAX_EMBEDS])
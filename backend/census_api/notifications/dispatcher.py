@@ -0,0 +1,83 @@
+import asyncio
+import contextlib
+import logging
+from collections.abc import Sequence
+
+from .base import Notification, Notifier
+
+
+class NotificationDispatcher:
+    """
+    Queue notifications to be sent by a background consumer.
+
+    Reports do not wait on notifiers, the consumer sends queued notifications in
+    batches. Notifications are sent inline when the consumer is not running, like in
+    scripts or tests. Failures are logged and never reach the caller.
+    """
+
+    def __init__(
+        self, *, notifiers: Sequence[Notifier], maxsize: int, batch_size: int
+    ) -> None:
+        self.notifiers = notifiers
+        self.batch_size = batch_size
+        self._queue: asyncio.Queue[Notification] = asyncio.Queue(maxsize=maxsize)
+        self._consumer: asyncio.Task[None] | None = None
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    async def dispatch(self, notification: Notification) -> None:
+        if self._consumer is None or self._consumer.done():
+            await self._send([notification])
+            return
+
+        try:
+            self._queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            logging.error(
+                f"notification queue is full, dropping notification for "
+                f"{notification.record.deployment_id}"
+            )
+
+    def start(self) -> None:
+        if self._consumer is None or self._consumer.done():
+            self._consumer = asyncio.create_task(self._consume())
+
+    async def stop(self, *, timeout: float) -> None:
+        """
+        Send the queued notifications, then stop the consumer.
+
+        Args:
+            timeout (float): Time in second to wait for the queue to be drained.
+        """
+        if self._consumer is None:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logging.error(f"{len(self)} notifications not sent before shutdown")
+
+        self._consumer.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._consumer
+        self._consumer = None
+
+    async def _consume(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                await self._send(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _send(self, notifications: Sequence[Notification]) -> None:
+        for notifier in self.notifiers:
+            try:
+                await notifier.send(notifications=notifications)
+            except Exception:
+                logging.exception(f"{type(notifier).__name__} failure")
@@ -0,0 +1,24 @@
+import asyncio
+import logging
+
+from census_api.core.database import async_session
+from census_api.crud.records import rebuild_counters
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def reconcile() -> int:
+    async with async_session() as session:
+        return await rebuild_counters(session=session)
+
+
+async def main() -> None:
+    logger.info("rebuilding census counters from records")
+    written = await reconcile()
+    logger.info(f"census counters rebuilt, {written} counters written")
+
+
+if __name__ == "__main__":
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main())
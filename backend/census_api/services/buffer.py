@@ -0,0 +1,140 @@
+import asyncio
+import contextlib
+import itertools
+import logging
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any, Generic, TypeVar
+
+from ..core.metrics import (
+    INGEST_BUFFER_DROPPED,
+    INGEST_BUFFER_FLUSH_SIZE,
+    INGEST_STAGE_SECONDS,
+)
+
+T = TypeVar("T")
+
+
+class WriteBehindBuffer(Generic[T]):
+    """
+    Collect items to be written together by a background flusher.
+
+    Items are written once `batch_size` of them are waiting, or `interval` seconds
+    after the first one was added, whichever comes first, which bounds how long an
+    acknowledged item may stay in memory only. Adding items waits when `maxsize` of
+    them are already waiting. A batch failing to be written is retried up to
+    `max_retries` times, waiting `retry_backoff` seconds doubled after each failure,
+    and dropped after that or when stopping. Items are written inline, once, when
+    the flusher is not running, like in scripts or tests.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        write: Callable[[Sequence[T]], Awaitable[Any]],
+        maxsize: int,
+        batch_size: int,
+        interval: float,
+        max_retries: int = 0,
+        retry_backoff: float = 1.0,
+    ) -> None:
+        self.write = write
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue: asyncio.Queue[T] = asyncio.Queue(maxsize=maxsize)
+        self._flusher: asyncio.Task[None] | None = None
+        self._full = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._stopping = False
+        self._flushing = 0
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None and not self._flusher.done()
+
+    async def add(self, item: T) -> None:
+        if not self.running:
+            await self._flush([item], max_retries=0)
+            return
+
+        await self._queue.put(item)
+        if self._queue.qsize() >= self.batch_size:
+            self._full.set()
+
+    def start(self) -> None:
+        if not self.running:
+            self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self, *, timeout: float) -> None:
+        """
+        Write the waiting items, then stop the flusher.
+
+        Args:
+            timeout (float): Time in second to wait for the buffer to be flushed.
+        """
+        if self._flusher is None:
+            return
+
+        # Waiting items are written right away rather than after the interval, and
+        # failed ones are not retried any longer
+        self._stopping = True
+        self._full.set()
+        self._stopped.set()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            dropped = len(self) + self._flushing
+            INGEST_BUFFER_DROPPED.inc(dropped)
+            logging.error(f"{dropped} buffered items not written before shutdown")
+
+        self._flusher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._flusher
+        self._flusher = None
+        self._stopping = False
+        self._stopped.clear()
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            # Waiting on an event rather than the queue never loses an item
+            if not self._stopping and self._queue.qsize() < self.batch_size - 1:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._full.wait(), timeout=self.interval)
+            self._full.clear()
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            self._flushing = len(batch)
+            try:
+                await self._flush(batch, max_retries=self.max_retries)
+            finally:
+                self._flushing = 0
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: Sequence[T], *, max_retries: int) -> None:
+        # Items were acknowledged already, they are only dropped as a last resort
+        for attempt in itertools.count():
+            INGEST_BUFFER_FLUSH_SIZE.observe(len(batch))
+            try:
+                with INGEST_STAGE_SECONDS.labels(stage="flush").time():
+                    await self.write(batch)
+            except Exception:
+                if attempt >= max_retries or self._stopping:
+                    INGEST_BUFFER_DROPPED.inc(len(batch))
+                    logging.exception(f"dropped {len(batch)} buffered items")
+                    return
+                logging.exception(f"failed to write {len(batch)} buffered items")
+            else:
+                return
+
+            # Stopping cuts the wait short, for a last attempt
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    self._stopped.wait(), timeout=self.retry_backoff * 2**attempt
+                )
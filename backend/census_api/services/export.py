@@ -0,0 +1,133 @@
+import csv
+import io
+import zlib
+from collections.abc import AsyncIterator
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from pydantic_core import to_json
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..core.config import settings
+from ..crud import records as crud
+from ..models import CensusRecord
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+
+# Media ranges a client may accept, mapped to the export format to use
+_MEDIA_TYPES = {
+    NDJSON_MEDIA_TYPE: NDJSON_MEDIA_TYPE,
+    "application/jsonl": NDJSON_MEDIA_TYPE,
+    "application/json": NDJSON_MEDIA_TYPE,
+    "application/*": NDJSON_MEDIA_TYPE,
+    "*/*": NDJSON_MEDIA_TYPE,
+    CSV_MEDIA_TYPE: CSV_MEDIA_TYPE,
+    "text/*": CSV_MEDIA_TYPE,
+}
+_COLUMNS = list(CensusRecord.model_fields)
+
+
+def _parse_header(value: str) -> list[tuple[str, float]]:
+    """
+    Return the values of an `Accept` like header, ordered by decreasing quality.
+    """
+    values = []
+    for item in value.split(","):
+        name, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, q = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(q)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            values.append((name.lower(), quality))
+    # Sorting is stable, keeping the client's order for equal qualities
+    return sorted(values, key=lambda v: v[1], reverse=True)
+
+
+def negotiate_media_type(*, accept: str | None) -> str:
+    """
+    Return the export media type to use given an `Accept` header.
+
+    Args:
+        accept (str | None): Value of the `Accept` header, NDJSON is used if unset.
+
+    Raises:
+        HTTPException: If none of the export formats is acceptable.
+
+    Returns:
+        str: Either the NDJSON or the CSV media type.
+    """
+    if not accept:
+        return NDJSON_MEDIA_TYPE
+
+    for name, quality in _parse_header(accept):
+        if quality > 0 and name in _MEDIA_TYPES:
+            return _MEDIA_TYPES[name]
+
+    raise HTTPException(
+        status_code=status.HTTP_406_NOT_ACCEPTABLE,
+        detail=f"Records can be exported as {NDJSON_MEDIA_TYPE} or {CSV_MEDIA_TYPE}",
+    )
+
+
+def accepts_gzip(*, accept_encoding: str | None) -> bool:
+    if not accept_encoding:
+        return False
+    return any(
+        name in {"gzip", "*"} and quality > 0
+        for name, quality in _parse_header(accept_encoding)
+    )
+
+
+async def export_records(
+    *, session: AsyncSession, media_type: str
+) -> AsyncIterator[bytes]:
+    """
+    Yield all records serialised in the given format, one chunk per batch of rows.
+
+    Args:
+        session (AsyncSession): Session to read records with.
+        media_type (str): Either the NDJSON or the CSV media type.
+
+    Yields:
+        bytes: Chunks of the export.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if media_type == CSV_MEDIA_TYPE:
+        writer.writerow(_COLUMNS)
+
+    async for rows in crud.stream_records(
+        session=session, batch_size=settings.EXPORT_BATCH_SIZE
+    ):
+        if media_type != CSV_MEDIA_TYPE:
+            # Encoded by pydantic-core, several times faster than the json module
+            yield b"".join(
+                to_json({c: row[c] for c in _COLUMNS}) + b"\n" for row in rows
+            )
+            continue
+
+        for row in rows:
+            writer.writerow(
+                row[c].isoformat() if isinstance(row[c], datetime) else row[c]
+                for c in _COLUMNS
+            )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if chunk := buffer.getvalue():
+        yield chunk.encode()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    async for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
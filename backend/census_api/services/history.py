@@ -0,0 +1,22 @@
+import logging
+from datetime import datetime, timezone
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..core.database import async_session
+from ..crud.counters import snapshot_counters
+
+
+async def snapshot_summary(*, session: AsyncSession) -> int:
+    # Days are UTC ones, the snapshot of the current day is refreshed until it ends
+    today = datetime.now(tz=timezone.utc).date()
+    written = await snapshot_counters(session=session, day=today)
+    await session.commit()
+
+    logging.info(f"stored {written} daily census counters for {today}")
+    return written
+
+
+async def run_rollup() -> int:
+    async with async_session() as session:
+        return await snapshot_summary(session=session)
@@ -1,87 +1,337 @@
-from datetime import datetime, timezone
+import asyncio
+import ipaddress
+import secrets
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 
 from fastapi import HTTPException, status
-from sqlalchemy.exc import IntegrityError
-from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from ..core.cache import LRUCache
 from ..core.config import settings
+from ..core.database import async_session
+from ..core.metrics import INGEST_STAGE_SECONDS, REPORTS
 from ..crud import records as crud
-from ..enums import CensusRecordEvent
-from ..models import CensusRecord, CensusRecordUpdate
-from ..notifications import get_notifiers
+from ..enums import CensusReportOutcome
+from ..models import (
+    CensusRecord,
+    CensusRecordBatchItem,
+    CensusRecordBatchResult,
+    CensusRecordUpdate,
+)
+from ..notifications import Notification, notification_dispatcher
 from ..utils import resolve_country_for_ip, version_strip_micro
+from .buffer import WriteBehindBuffer
+from .summary import summary_cache
 
 
-async def process_census_report(
-    *, session: AsyncSession, record: CensusRecordUpdate, real_ip: str | None
-) -> CensusRecord:
-    now = datetime.now(tz=timezone.utc)
+@dataclass(frozen=True, slots=True)
+class RateLimitedRecord:
+    # Columns of a record, a model instance with its ORM state is 4 times larger
+    deployment_id: str
+    version: str
+    python_version: str | None
+    country: str | None
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_record(cls, record: CensusRecord) -> "RateLimitedRecord":
+        return cls(
+            deployment_id=record.deployment_id,
+            version=record.version,
+            python_version=record.python_version,
+            country=record.country,
+            created_at=record.created_at,
+            updated_at=record.updated_at,
+        )
+
+    def to_record(self) -> CensusRecord:
+        return CensusRecord(
+            deployment_id=self.deployment_id,
+            version=self.version,
+            python_version=self.python_version,
+            country=self.country,
+            created_at=self.created_at,
+            updated_at=self.updated_at,
+        )
+
+
+# Records known to be within their rate limit window, by deployment ID
+rate_limit_cache: LRUCache[str, RateLimitedRecord] = LRUCache(
+    maxsize=settings.RATE_LIMIT_CACHE_SIZE, ttl=settings.RATE_LIMIT
+)
+
+
+def _cache_rate_limited(*, record: CensusRecord, now: datetime) -> None:
+    # Entries expire a bit before the window ends, leaving the edge to the database
+    updated_at = record.updated_at
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    window_end = updated_at + timedelta(seconds=settings.RATE_LIMIT)
+    ttl = (window_end - now).total_seconds() - settings.RATE_LIMIT_CACHE_MARGIN
+    if ttl > 0:
+        rate_limit_cache.set(
+            record.deployment_id, RateLimitedRecord.from_record(record), ttl=ttl
+        )
+
+
+def _has_changed(*, previous: CensusRecord | None, record: CensusRecord) -> bool:
+    # Only send a notification if something has really changed
+    return (
+        previous is None
+        or previous.version != record.version
+        or previous.python_version != record.python_version
+    )
+
+
+def _parse_real_ip(*, real_ip: str | None) -> str | None:
+    # Parsed before writing anything, an invalid address must not fail a report
+    if not real_ip:
+        return None
+    try:
+        return str(ipaddress.ip_address(real_ip.strip()))
+    except ValueError:
+        return None
 
-    await crud.delete_expired_records(session=session, start_time=now)
 
+def _check_report(*, record: CensusRecordUpdate) -> CensusRecord | None:
+    # Reject ignored deployments and answer those known to be rate limited
     if record.deployment_id in settings.DEPLOYMENT_IDS_TO_IGNORE:
+        REPORTS.labels(outcome=CensusReportOutcome.IGNORED.value).inc()
         raise HTTPException(
             status_code=status.HTTP_406_NOT_ACCEPTABLE,
             detail="Deployment ID is the same as used in example configuration",
         )
 
-    db_record = await crud.get_record_for_update(
-        session=session, deployment_id=record.deployment_id
-    )
+    # Records are not written within their rate limit window, no need to ask
+    if (entry := rate_limit_cache.get(record.deployment_id)) is not None:
+        REPORTS.labels(outcome=CensusReportOutcome.RATE_LIMITED.value).inc()
+        return entry.value.to_record()
+    return None
 
-    event: CensusRecordEvent | None = None
-    send_notification = True
 
-    if db_record:
-        interval = (
-            now - db_record.updated_at.astimezone(tz=timezone.utc)
-        ).total_seconds()
-        python_version = version_strip_micro(version=record.python_version)
+async def process_census_report(
+    *, session: AsyncSession, record: CensusRecordUpdate, real_ip: str | None
+) -> CensusRecord:
+    now = datetime.now(tz=timezone.utc)
 
-        if interval >= settings.RATE_LIMIT:
-            # Only send a notification if something has really changed
-            send_notification = (
-                db_record.version != record.version
-                or db_record.python_version != python_version
-            )
+    if (cached := _check_report(record=record)) is not None:
+        return cached
+    real_ip = _parse_real_ip(real_ip=real_ip)
 
-            country = (
-                await resolve_country_for_ip(ip_address=real_ip) if real_ip else None
-            )
-            db_record = await crud.update_record(
-                session=session,
-                db_record=db_record,
-                version=record.version,
-                python_version=python_version,
-                country=country,
-                now=now,
-            )
-            event = CensusRecordEvent.UPDATED
-    else:
+    # Resolve the country first, the record is then written by a single statement
+    with INGEST_STAGE_SECONDS.labels(stage="geoip").time():
         country = await resolve_country_for_ip(ip_address=real_ip) if real_ip else None
-        try:
-            db_record = await crud.create_record(
-                session=session,
-                deployment_id=record.deployment_id,
-                version=record.version,
-                python_version=version_strip_micro(version=record.python_version),
-                country=country,
-                now=now,
+
+    with INGEST_STAGE_SECONDS.labels(stage="upsert").time():
+        result = await crud.upsert_record(
+            session=session,
+            deployment_id=record.deployment_id,
+            version=record.version,
+            python_version=version_strip_micro(version=record.python_version),
+            country=country,
+            now=now,
+        )
+    if not result.event:
+        REPORTS.labels(outcome=CensusReportOutcome.RATE_LIMITED.value).inc()
+        _cache_rate_limited(record=result.record, now=now)
+        return result.record
+    REPORTS.labels(outcome=result.event.value).inc()
+
+    db_record = result.record
+    summary_cache.invalidate()
+    _cache_rate_limited(record=db_record, now=now)
+
+    if _has_changed(previous=result.previous, record=db_record):
+        with INGEST_STAGE_SECONDS.labels(stage="notify").time():
+            await notification_dispatcher.dispatch(
+                Notification(event=result.event, record=db_record)
             )
-        except IntegrityError:
-            # Another concurrent request already created this record
-            await session.rollback()
-            results = await session.exec(
-                select(CensusRecord).where(
-                    CensusRecord.deployment_id == record.deployment_id
+
+    return db_record
+
+
+async def _resolve_countries(
+    *, reports: dict[str, CensusRecordBatchItem]
+) -> dict[str, str | None]:
+    # Resolve countries concurrently, before the transaction
+    addresses = list({str(r.ip_address) for r in reports.values() if r.ip_address})
+    semaphore = asyncio.Semaphore(settings.GEOIP_BATCH_CONCURRENCY)
+
+    async def resolve(address: str) -> str | None:
+        # A batch must not start as many lookups as it has addresses at once
+        async with semaphore:
+            return await resolve_country_for_ip(ip_address=address)
+
+    with INGEST_STAGE_SECONDS.labels(stage="batch_geoip").time():
+        countries = await asyncio.gather(*(resolve(a) for a in addresses))
+    resolved = dict(zip(addresses, countries, strict=True))
+
+    return {
+        deployment_id: resolved[str(report.ip_address)] if report.ip_address else None
+        for deployment_id, report in reports.items()
+    }
+
+
+def is_trusted_relay(*, token: str | None) -> bool:
+    """
+    Tell if a batch of reports comes from a relay allowed to set their addresses.
+
+    Args:
+        token (str | None): Token sent by the client, if any.
+
+    Returns:
+        bool: True if relay tokens are configured and the token is a valid one.
+    """
+    if not settings.BATCH_RELAY_TOKEN or not token:
+        return False
+    return secrets.compare_digest(token.encode(), settings.BATCH_RELAY_TOKEN.encode())
+
+
+def with_real_ip(
+    *, records: Sequence[CensusRecordBatchItem], real_ip: str | None
+) -> list[CensusRecordBatchItem]:
+    """
+    Replace the addresses of reports by the one the batch was received from.
+
+    Args:
+        records (Sequence[CensusRecordBatchItem]): Reports of the batch.
+        real_ip (str | None): Address the batch was received from.
+
+    Returns:
+        list[CensusRecordBatchItem]: The reports, with the same address.
+    """
+    address = _parse_real_ip(real_ip=real_ip)
+    ip_address = ipaddress.ip_address(address) if address else None
+    return [record.model_copy(update={"ip_address": ip_address}) for record in records]
+
+
+async def process_census_reports(
+    *, session: AsyncSession, records: Sequence[CensusRecordBatchItem]
+) -> list[CensusRecordBatchResult]:
+    """
+    Process census reports in bulk, with the same rules as single reports.
+
+    Countries are resolved first, records are then written with them by a single
+    statement and transaction. Reports of ignored deployment IDs are not rejected
+    but reported as ignored, and reports repeating a deployment ID of the batch
+    are rate limited by the first one.
+
+    Args:
+        session (AsyncSession): Session to use.
+        records (Sequence[CensusRecordBatchItem]): Reports, in the order received.
+
+    Returns:
+        list[CensusRecordBatchResult]: The outcome of each report, in the same order.
+    """
+    now = datetime.now(tz=timezone.utc)
+
+    # Records known to be rate limited and reports to write, once per deployment
+    stored: dict[str, CensusRecord] = {}
+    pending: dict[str, CensusRecordBatchItem] = {}
+    for report in records:
+        deployment_id = report.deployment_id
+        if deployment_id in settings.DEPLOYMENT_IDS_TO_IGNORE:
+            continue
+        if deployment_id in stored or deployment_id in pending:
+            continue
+        if (entry := rate_limit_cache.get(deployment_id)) is not None:
+            stored[deployment_id] = entry.value.to_record()
+        else:
+            pending[deployment_id] = report
+
+    countries = await _resolve_countries(reports=pending)
+    with INGEST_STAGE_SECONDS.labels(stage="batch_upsert").time():
+        results = await crud.upsert_records(
+            session=session,
+            records=[
+                CensusRecordUpdate(
+                    deployment_id=report.deployment_id,
+                    version=report.version,
+                    python_version=version_strip_micro(version=report.python_version),
                 )
+                for report in pending.values()
+            ],
+            countries=countries,
+            now=now,
+        )
+    written = {i: result for i, result in results.items() if result.event}
+
+    stored.update({i: result.record for i, result in results.items()})
+    for record in stored.values():
+        _cache_rate_limited(record=record, now=now)
+
+    if written:
+        summary_cache.invalidate()
+    for deployment_id, result in written.items():
+        record = stored[deployment_id]
+        if result.event and _has_changed(previous=result.previous, record=record):
+            await notification_dispatcher.dispatch(
+                Notification(event=result.event, record=record)
             )
-            return results.first()
-        event = CensusRecordEvent.CREATED
 
-    if event and send_notification:
-        for notifier in get_notifiers():
-            await notifier.send(event=event, record=db_record)
+    events = {i: result.event for i, result in written.items() if result.event}
+    outcomes = []
+    for report in records:
+        deployment_id = report.deployment_id
+        outcome = CensusReportOutcome.RATE_LIMITED
+        if deployment_id in settings.DEPLOYMENT_IDS_TO_IGNORE:
+            outcome = CensusReportOutcome.IGNORED
+        # Only the first report of a deployment may have been written
+        elif (event := events.pop(deployment_id, None)) is not None:
+            outcome = CensusReportOutcome(event.value)
 
-    return db_record
+        REPORTS.labels(outcome=outcome.value).inc()
+        outcomes.append(
+            CensusRecordBatchResult(
+                deployment_id=deployment_id,
+                outcome=outcome,
+                record=stored.get(deployment_id),
+            )
+        )
+    return outcomes
+
+
+async def _write_buffered_reports(reports: Sequence[CensusRecordBatchItem]) -> None:
+    async with async_session() as session:
+        await process_census_reports(session=session, records=reports)
+
+
+report_buffer: WriteBehindBuffer[CensusRecordBatchItem] = WriteBehindBuffer(
+    write=_write_buffered_reports,
+    maxsize=settings.INGEST_BUFFER_SIZE,
+    batch_size=settings.INGEST_BUFFER_BATCH_SIZE,
+    interval=settings.INGEST_BUFFER_INTERVAL,
+    max_retries=settings.INGEST_BUFFER_MAX_RETRIES,
+    retry_backoff=settings.INGEST_BUFFER_RETRY_BACKOFF,
+)
+
+
+async def buffer_census_report(
+    *, record: CensusRecordUpdate, real_ip: str | None
+) -> CensusRecord | None:
+    """
+    Accept a census report to be written later, with others, by the buffer.
+
+    Ignored deployments are still rejected and rate limited ones answered from the
+    cache, other reports are only validated before being buffered.
+
+    Args:
+        record (CensusRecordUpdate): Report to process.
+        real_ip (str | None): Address the report was received from.
+
+    Returns:
+        CensusRecord | None: The current record if it is known to be rate limited,
+            None if the report was buffered.
+    """
+    if (cached := _check_report(record=record)) is not None:
+        return cached
+
+    await report_buffer.add(
+        CensusRecordBatchItem.model_validate(
+            {**record.model_dump(), "ip_address": _parse_real_ip(real_ip=real_ip)}
+        )
+    )
+    return None
@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..core.database import async_session
+from ..core.metrics import RETENTION_DELETED, RETENTION_LAST_SUCCESS, RETENTION_SECONDS
+from ..crud import records as crud
+from .summary import summary_cache
+
+
+async def expire_records(*, session: AsyncSession) -> int:
+    now = datetime.now(tz=timezone.utc)
+    with RETENTION_SECONDS.time():
+        count = await crud.delete_expired_records(session=session, start_time=now)
+    RETENTION_DELETED.inc(count)
+    RETENTION_LAST_SUCCESS.set_to_current_time()
+    if count:
+        summary_cache.invalidate()
+    return count
+
+
+async def run_retention() -> int:
+    async with async_session() as session:
+        return await expire_records(session=session)
@@ -0,0 +1,74 @@
+import asyncio
+import gzip
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..core.config import settings
+from ..core.database import read_session
+from ..core.metrics import SUMMARY_SNAPSHOT_LAST_SUCCESS
+from ..crud import records as crud
+from ..models import CensusSummarySnapshot
+
+SNAPSHOT_FILENAME = "summary.json"
+
+
+def _write_atomically(path: Path, content: bytes) -> None:
+    # Readers see either the previous file or the new one, never a partial write
+    fd, name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    temporary = Path(name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        # Temporary files are only readable by their owner, the web server is not
+        temporary.chmod(0o644)
+        temporary.replace(path)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+
+
+def _write_snapshot(directory: Path, content: bytes) -> None:
+    path = directory / SNAPSHOT_FILENAME
+    # The compressed file is written first, it is only served if the plain one is
+    _write_atomically(
+        path.with_name(f"{path.name}.gz"), gzip.compress(content, mtime=0)
+    )
+    _write_atomically(path, content)
+
+
+async def write_summary_snapshot(
+    *, session: AsyncSession, directory: Path
+) -> CensusSummarySnapshot:
+    """
+    Write the census summaries to a static file, along with a gzip compressed copy.
+
+    Args:
+        session (AsyncSession): Session to compute the summaries with.
+        directory (Path): Directory to write the files into, it must exist.
+
+    Returns:
+        CensusSummarySnapshot: The snapshot written.
+    """
+    now = datetime.now(tz=timezone.utc)
+    snapshot = CensusSummarySnapshot(
+        generated_at=now,
+        expires_at=now + timedelta(seconds=settings.SUMMARY_SNAPSHOT_MAX_AGE),
+        summary=await crud.get_summary(session=session),
+    )
+    await asyncio.to_thread(
+        _write_snapshot, directory, snapshot.model_dump_json().encode()
+    )
+    SUMMARY_SNAPSHOT_LAST_SUCCESS.set_to_current_time()
+    return snapshot
+
+
+async def run_snapshot() -> None:
+    directory = Path(settings.SUMMARY_SNAPSHOT_DIR)
+    async with read_session.session() as session:
+        await write_summary_snapshot(session=session, directory=directory)
+    logging.debug(f"wrote census summary snapshot to {directory}")
@@ -0,0 +1,86 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..core.config import settings
+from ..crud import records as crud
+
+
+@dataclass(frozen=True)
+class CachedSummary:
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+class SummaryCache:
+    """
+    In-process cache of the serialised census summaries.
+
+    Concurrent misses wait for a single computation instead of all querying the
+    database. The cache is invalidated when records are created or updated.
+    """
+
+    def __init__(self) -> None:
+        self._entry: CachedSummary | None = None
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        self._entry = None
+        self._generation += 1
+
+    def _fresh_entry(self) -> CachedSummary | None:
+        entry = self._entry
+        if entry and entry.expires_at > time.monotonic():
+            return entry
+        return None
+
+    async def get(self, *, session: AsyncSession) -> CachedSummary:
+        if entry := self._fresh_entry():
+            return entry
+
+        async with self._lock:
+            # Another request may have refreshed the entry while we were waiting
+            if entry := self._fresh_entry():
+                return entry
+
+            generation = self._generation
+            summary = await crud.get_summary(session=session)
+            body = summary.model_dump_json().encode()
+            entry = CachedSummary(
+                body=body,
+                etag=f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+                expires_at=time.monotonic() + settings.SUMMARY_CACHE_TTL,
+            )
+
+            # Do not keep a summary computed before an invalidation
+            if generation == self._generation:
+                self._entry = entry
+            return entry
+
+
+summary_cache = SummaryCache()
+
+
+def etag_matches(*, if_none_match: str, etag: str) -> bool:
+    """
+    Tell if an `If-None-Match` header value matches an entity tag.
+
+    Args:
+        if_none_match (str): Value of the `If-None-Match` request header.
+        etag (str): Current entity tag of the resource.
+
+    Returns:
+        bool: True if the client already has the current representation.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as mandated for If-None-Match by RFC 9110
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
@@ -1,12 +1,21 @@
+import csv
+import io
+import json
 from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
 
 import pytest
 from httpx import AsyncClient, codes
+from prometheus_client import REGISTRY
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from census_api.core.config import settings
 from census_api.models import CensusRecord
+from census_api.services.history import snapshot_summary
+from census_api.services.records import report_buffer
+from census_api.services.retention import expire_records
+from census_api.tests.helpers import create_record
 
 
 @pytest.mark.usefixtures("discord_notification")
@@ -43,6 +52,104 @@ async def test_create_census_record_fail(client: AsyncClient) -> None:
     assert response.status_code == codes.NOT_ACCEPTABLE
 
 
+async def test_create_census_record_buffered(client: AsyncClient) -> None:
+    settings.INGEST_BUFFER = True
+    record = {"deployment_id": "aaaaaaaaa", "version": "1.9.0", "python_version": "3"}
+
+    try:
+        with patch.object(report_buffer, "add", new_callable=AsyncMock) as add:
+            response = await client.post(
+                f"{settings.API_V1_STR}/records/",
+                json=record,
+                headers={"X-Real-IP": "1.2.3.4"},
+            )
+    finally:
+        settings.INGEST_BUFFER = False
+
+    assert response.status_code == codes.ACCEPTED
+    add.assert_awaited_once()
+    (item,) = add.await_args_list[0].args
+    assert item.deployment_id == "aaaaaaaaa"
+    assert str(item.ip_address) == "1.2.3.4"
+
+
+@pytest.mark.usefixtures("discord_notification")
+async def test_create_census_records(client: AsyncClient) -> None:
+    settings.DEPLOYMENT_IDS_TO_IGNORE = ["invalid"]
+
+    response = await client.post(
+        f"{settings.API_V1_STR}/records/batch",
+        json=[
+            {
+                "deployment_id": "aaaaaaaaa",
+                "version": "1.9.0",
+                "python_version": "3.12.0",
+            },
+            {
+                "deployment_id": "aaaaaaaaa",
+                "version": "2.0.0",
+                "python_version": "3.13.0",
+            },
+            {"deployment_id": "invalid", "version": "1.9.0", "python_version": "3.12"},
+        ],
+    )
+    data = response.json()
+
+    assert response.status_code == codes.OK
+    assert [item["outcome"] for item in data] == ["created", "rate_limited", "ignored"]
+    assert data[0]["record"]["python_version"] == "3.12"
+    assert data[1]["record"] == data[0]["record"]
+    assert data[2]["record"] is None
+
+
+@pytest.mark.usefixtures("discord_notification")
+@pytest.mark.parametrize(
+    ("relay_token", "country"), [(None, "FR"), ("wrong", "FR"), ("relay", "DE")]
+)
+async def test_create_census_records_address(
+    client: AsyncClient, relay_token: str | None, country: str
+) -> None:
+    settings.BATCH_RELAY_TOKEN = "relay"
+    headers = {"X-Real-IP": "1.2.3.4"}
+    if relay_token:
+        headers["X-Relay-Token"] = relay_token
+    countries = {"1.2.3.4": "FR", "5.6.7.8": "DE"}
+
+    try:
+        with patch(
+            "census_api.services.records.resolve_country_for_ip",
+            new_callable=AsyncMock,
+            side_effect=lambda *, ip_address: countries[ip_address],
+        ):
+            response = await client.post(
+                f"{settings.API_V1_STR}/records/batch",
+                json=[
+                    {
+                        "deployment_id": "aaaaaaaaa",
+                        "version": "1.9.0",
+                        "python_version": "3.12.0",
+                        "ip_address": "5.6.7.8",
+                    }
+                ],
+                headers=headers,
+            )
+    finally:
+        settings.BATCH_RELAY_TOKEN = ""
+
+    # Only relays may set the address of a report, others get their own
+    assert response.status_code == codes.OK
+    assert response.json()[0]["record"]["country"] == country
+
+
+async def test_create_census_records_too_many(client: AsyncClient) -> None:
+    record = {"deployment_id": "aaaaaaaaa", "version": "1.9.0", "python_version": "3"}
+    response = await client.post(
+        f"{settings.API_V1_STR}/records/batch",
+        json=[record] * (settings.BATCH_MAX_SIZE + 1),
+    )
+    assert response.status_code == codes.UNPROCESSABLE_ENTITY
+
+
 @pytest.mark.usefixtures("discord_notification")
 async def test_update_census_record(session: AsyncSession, client: AsyncClient) -> None:
     # Insert who a date to avoid rate limiting
@@ -102,7 +209,7 @@ async def test_delete_expired_census_record(
     session.add(census)
     await session.commit()
 
-    # Make a request to force records cleanup
+    # Reports must not pay for the records cleanup
     await client.post(
         f"{settings.API_V1_STR}/records/",
         json={
@@ -112,6 +219,11 @@ async def test_delete_expired_census_record(
         },
     )
 
+    results = await session.exec(statement=select(CensusRecord))
+    assert len(results.all()) == 2  # noqa: PLR2004
+
+    await expire_records(session=session)
+
     results = await session.exec(statement=select(CensusRecord))
     records = results.all()
 
@@ -121,6 +233,109 @@ async def test_delete_expired_census_record(
     assert records[0].updated_at.astimezone(timezone.utc) > past
 
 
+async def test_read_records_pages(session: AsyncSession, client: AsyncClient) -> None:
+    now = datetime.now(tz=timezone.utc)
+    for i in range(5):
+        await create_record(
+            session=session,
+            deployment_id=f"deployment-{i}",
+            version="1.9.0",
+            python_version="3.12",
+            country=None,
+            now=now,
+        )
+
+    deployment_ids: list[str] = []
+    url: str | None = f"{settings.API_V1_STR}/records/?limit=2"
+    while url:
+        response = await client.get(url)
+        assert response.status_code == codes.OK
+        deployment_ids.extend(r["deployment_id"] for r in response.json())
+        url = response.links.get("next", {}).get("url")
+
+    assert deployment_ids == [f"deployment-{i}" for i in range(5)]
+    assert "x-next-cursor" not in response.headers
+
+
+async def test_read_records_offset(session: AsyncSession, client: AsyncClient) -> None:
+    now = datetime.now(tz=timezone.utc)
+    for i in range(3):
+        await create_record(
+            session=session,
+            deployment_id=f"deployment-{i}",
+            version="1.9.0",
+            python_version="3.12",
+            country=None,
+            now=now,
+        )
+
+    response = await client.get(f"{settings.API_V1_STR}/records/?offset=1&limit=1")
+
+    assert [r["deployment_id"] for r in response.json()] == ["deployment-1"]
+    response = await client.get(
+        f"{settings.API_V1_STR}/records/",
+        params={"cursor": response.headers["x-next-cursor"]},
+    )
+    assert [r["deployment_id"] for r in response.json()] == ["deployment-2"]
+
+
+async def test_read_records_invalid_cursor(client: AsyncClient) -> None:
+    response = await client.get(f"{settings.API_V1_STR}/records/?cursor=a")
+
+    assert response.status_code == codes.BAD_REQUEST
+
+
+async def test_export_records(session: AsyncSession, client: AsyncClient) -> None:
+    now = datetime.now(tz=timezone.utc)
+    for i in range(3):
+        await create_record(
+            session=session,
+            deployment_id=f"deployment-{i}",
+            version="1.9.0",
+            python_version="3.12",
+            country="FR" if i else None,
+            now=now,
+        )
+
+    response = await client.get(
+        f"{settings.API_V1_STR}/records/export", headers={"Accept-Encoding": "br"}
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.status_code == codes.OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "content-encoding" not in response.headers
+    assert [line["deployment_id"] for line in lines] == [
+        f"deployment-{i}" for i in range(3)
+    ]
+    assert lines[0]["country"] is None
+    assert lines[1]["country"] == "FR"
+    assert datetime.fromisoformat(lines[0]["created_at"])
+
+    response = await client.get(
+        f"{settings.API_V1_STR}/records/export",
+        headers={"Accept": "text/csv", "Accept-Encoding": "gzip"},
+    )
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+
+    assert response.status_code == codes.OK
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-encoding"] == "gzip"
+    assert [row["deployment_id"] for row in rows] == [
+        f"deployment-{i}" for i in range(3)
+    ]
+    assert rows[0]["country"] == ""
+    assert rows[2]["country"] == "FR"
+
+
+async def test_export_records_not_acceptable(client: AsyncClient) -> None:
+    response = await client.get(
+        f"{settings.API_V1_STR}/records/export", headers={"Accept": "text/html"}
+    )
+
+    assert response.status_code == codes.NOT_ACCEPTABLE
+
+
 async def test_update_census_record_rate_limited(
     session: AsyncSession, client: AsyncClient
 ) -> None:
@@ -248,17 +463,14 @@ async def test_read_summary(session: AsyncSession, client: AsyncClient) -> None:
     for deployment_id, version, python_version, country in zip(
         deployment_ids, versions, python_versions, countries, strict=False
     ):
-        session.add(
-            CensusRecord(
-                deployment_id=deployment_id,
-                version=version,
-                python_version=python_version,
-                country=country,
-                created_at=now,
-                updated_at=now,
-            )
+        await create_record(
+            session=session,
+            deployment_id=deployment_id,
+            version=version,
+            python_version=python_version,
+            country=country,
+            now=now,
         )
-    await session.commit()
 
     response = await client.get(f"{settings.API_V1_STR}/records/summary")
     data = response.json()
@@ -347,3 +559,173 @@ async def test_read_summary(session: AsyncSession, client: AsyncClient) -> None:
             },
         ],
     }
+
+
+async def test_read_summary_not_modified(
+    session: AsyncSession, client: AsyncClient
+) -> None:
+    await create_record(
+        session=session,
+        deployment_id="aaaaaaaaa",
+        version="1.9.0",
+        python_version="3.12",
+        country="FR",
+        now=datetime.now(tz=timezone.utc),
+    )
+
+    response = await client.get(f"{settings.API_V1_STR}/records/summary")
+    etag = response.headers["etag"]
+
+    assert response.status_code == codes.OK
+    assert response.headers["cache-control"] == (
+        f"public, max-age={settings.SUMMARY_CACHE_TTL}"
+    )
+
+    response = await client.get(
+        f"{settings.API_V1_STR}/records/summary", headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == codes.NOT_MODIFIED
+    assert response.headers["etag"] == etag
+    assert not response.content
+
+
+@pytest.mark.usefixtures("discord_notification")
+async def test_read_summary_invalidated_by_report(client: AsyncClient) -> None:
+    response = await client.get(f"{settings.API_V1_STR}/records/summary")
+    etag = response.headers["etag"]
+
+    assert response.json()["version"] == []
+
+    await client.post(
+        f"{settings.API_V1_STR}/records/",
+        json={
+            "deployment_id": "aaaaaaaaa",
+            "version": "1.9.0",
+            "python_version": "3.12.0",
+        },
+    )
+
+    response = await client.get(
+        f"{settings.API_V1_STR}/records/summary", headers={"If-None-Match": etag}
+    )
+    data = response.json()
+
+    assert response.status_code == codes.OK
+    assert response.headers["etag"] != etag
+    assert data["version"] == [{"label": "1.9.0", "count": 1, "percentage": 100.0}]
+
+
+async def test_read_summary_history(session: AsyncSession, client: AsyncClient) -> None:
+    await create_record(
+        session=session,
+        deployment_id="aaaaaaaaa",
+        version="1.9.0",
+        python_version="3.12",
+        country="FR",
+        now=datetime.now(tz=timezone.utc),
+    )
+    await snapshot_summary(session=session)
+
+    response = await client.get(
+        f"{settings.API_V1_STR}/records/summary/history",
+        params={"dimension": "python_version"},
+    )
+    data = response.json()
+
+    assert response.status_code == codes.OK
+    assert data["dimension"] == "python_version"
+    assert data["interval"] == 1
+    (point,) = data["points"]
+    assert point["day"] == datetime.now(tz=timezone.utc).date().isoformat()
+    assert point["summary"] == [{"label": "3.12", "count": 1, "percentage": 100.0}]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"until": "0001-01-05"},
+        {"since": "0001-01-01", "until": "9999-12-31"},
+    ],
+)
+async def test_read_summary_history_extreme_dates(
+    client: AsyncClient, params: dict[str, str]
+) -> None:
+    response = await client.get(
+        f"{settings.API_V1_STR}/records/summary/history",
+        params={"dimension": "version", **params},
+    )
+    assert response.status_code == codes.OK
+    assert response.json()["points"] == []
+
+
+@pytest.mark.parametrize(
+    ("params", "status_code"),
+    [
+        (
+            {
+                "dimension": "python_version",
+                "since": "2026-02-01",
+                "until": "2026-01-01",
+            },
+            codes.BAD_REQUEST,
+        ),
+        ({"dimension": "deployment_id"}, codes.UNPROCESSABLE_ENTITY),
+    ],
+)
+async def test_read_summary_history_invalid(
+    client: AsyncClient, params: dict[str, str], status_code: int
+) -> None:
+    response = await client.get(
+        f"{settings.API_V1_STR}/records/summary/history", params=params
+    )
+    assert response.status_code == status_code
+
+
+async def test_get_stats(client: AsyncClient) -> None:
+    response = await client.get(f"{settings.API_V1_STR}/health/stats")
+    data = response.json()
+
+    assert response.status_code == codes.OK
+    assert data["geoip_cache"] == {"size": 0, "hits": 0, "misses": 0}
+    assert data["rate_limit_cache"] == {"size": 0, "hits": 0, "misses": 0}
+    assert data["database_pool"]["size"] == settings.POSTGRES_POOL_SIZE
+    assert {"checked_out", "saturation", "wait_time"} <= data["database_pool"].keys()
+
+
+@pytest.mark.usefixtures("discord_notification")
+async def test_get_metrics(client: AsyncClient) -> None:
+    def sample(name: str, **labels: str) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    created = sample("census_reports_total", outcome="created")
+    requests = sample(
+        "census_http_requests_total",
+        method="POST",
+        route=f"{settings.API_V1_STR}/records/",
+        status="200",
+    )
+
+    await client.post(
+        f"{settings.API_V1_STR}/records/",
+        json={
+            "deployment_id": "aaaaaaaaa",
+            "version": "1.9.0",
+            "python_version": "3.12.0",
+        },
+    )
+    response = await client.get("/metrics")
+
+    assert response.status_code == codes.OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'census_ingest_stage_seconds_count{stage="upsert"}' in response.text
+    assert sample("census_reports_total", outcome="created") == created + 1
+    assert (
+        sample(
+            "census_http_requests_total",
+            method="POST",
+            route=f"{settings.API_V1_STR}/records/",
+            status="200",
+        )
+        == requests + 1
+    )
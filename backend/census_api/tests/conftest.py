@@ -1,3 +1,4 @@
+import os
 from collections.abc import AsyncGenerator
 
 import pytest
@@ -10,9 +11,27 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel.pool import StaticPool
 
 from census_api.core.config import settings
-from census_api.core.dependencies import get_session
+from census_api.core.dependencies import get_read_session, get_session
+from census_api.core.http import http_client
+from census_api.generate_dataset import load_records
+from census_api.geoip import ipinfo_resolver
 from census_api.main import app
 from census_api.notifications import _discord_notifier
+from census_api.services.records import rate_limit_cache
+from census_api.services.summary import summary_cache
+
+
+@pytest.fixture(autouse=True)
+def _reset_caches() -> None:
+    summary_cache.invalidate()
+    ipinfo_resolver.cache.clear()
+    rate_limit_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+async def _close_http_client() -> AsyncGenerator[None, None]:
+    yield
+    await http_client.aclose()
 
 
 @pytest.fixture(name="session")
@@ -41,6 +60,7 @@ async def client_fixture(session: AsyncSession) -> AsyncGenerator[AsyncClient, N
         return session
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
 
     async with AsyncClient(
         base_url="http://test.example.com", transport=ASGITransport(app=app)
@@ -54,3 +74,10 @@ async def client_fixture(session: AsyncSession) -> AsyncGenerator[AsyncClient, N
 async def _discord_notification_fixture(httpx_mock: HTTPXMock) -> None:
     _discord_notifier._last_notified.clear()  # noqa: SLF001
     httpx_mock.add_response(url=settings.DISCORD_WEBHOOK_URL)
+
+
+@pytest.fixture(name="dataset")
+async def dataset_fixture(session: AsyncSession) -> int:
+    """Load generated records, set `CENSUS_TEST_DATASET_SIZE` to test at scale."""
+    count = int(os.environ.get("CENSUS_TEST_DATASET_SIZE", "2000"))
+    return await load_records(session=session, count=count)
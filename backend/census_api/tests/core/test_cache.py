@@ -0,0 +1,32 @@
+from unittest.mock import patch
+
+from census_api.core.cache import LRUCache
+
+
+def test_lru_cache_eviction() -> None:
+    cache: LRUCache[str, int] = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # Using "a" makes "b" the least recently used entry
+    assert cache.get("a") is not None
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1}
+
+
+def test_lru_cache_expiry() -> None:
+    cache: LRUCache[str, int | None] = LRUCache(maxsize=10, ttl=60)
+    with patch("census_api.core.cache.time.monotonic", return_value=0):
+        cache.set("a", 1)
+        cache.set("b", None, ttl=10)
+
+    with patch("census_api.core.cache.time.monotonic", return_value=30):
+        entry = cache.get("a")
+        assert entry is not None
+        assert entry.value == 1
+        assert cache.get("b") is None
+        assert len(cache) == 1
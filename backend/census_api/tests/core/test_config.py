@@ -0,0 +1,15 @@
+import pytest
+from pydantic import ValidationError
+
+from census_api.core.config import Settings
+
+
+def test_local_geoip_requires_database_path() -> None:
+    with pytest.raises(ValidationError, match="GEOIP_DATABASE_PATH must be set"):
+        Settings(GEOIP_BACKEND="local", GEOIP_DATABASE_PATH="")  # type: ignore[call-arg]
+
+    configured = Settings(
+        GEOIP_BACKEND="local",
+        GEOIP_DATABASE_PATH="/data/geoip.csv",
+    )  # type: ignore[call-arg]
+    assert configured.GEOIP_DATABASE_PATH == "/data/geoip.csv"
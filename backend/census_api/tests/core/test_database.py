@@ -0,0 +1,163 @@
+import asyncio
+from pathlib import Path
+
+import aiosqlite
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import select
+
+from census_api.core.database import (
+    InstrumentedPool,
+    ReadSessionFactory,
+    get_pool_stats,
+)
+
+
+async def test_instrumented_pool_stats() -> None:
+    engine = create_async_engine(
+        "sqlite+aiosqlite://", poolclass=InstrumentedPool, pool_size=2, max_overflow=1
+    )
+    pool = engine.pool
+    assert isinstance(pool, InstrumentedPool)
+
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+        stats = pool.stats()
+        assert stats["checked_out"] == 1
+        assert stats["saturation"] == round(1 / 3, 3)
+
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+    await engine.dispose()
+
+    stats = pool.stats()
+    assert stats["checkouts"] == 2  # noqa: PLR2004
+    assert stats["checked_out"] == 0
+    assert stats["timeouts"] == 0
+    assert stats["wait_time"] >= stats["max_wait_time"] >= 0
+
+
+async def test_read_session_factory_fallback(tmp_path: Path) -> None:
+    primary_engine = create_async_engine("sqlite+aiosqlite://")
+    # The parent directory does not exist, connections fail
+    replica_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}",
+        poolclass=InstrumentedPool,
+    )
+    factory = ReadSessionFactory(
+        primary=primary_engine,
+        replica=replica_engine,
+        retry_interval=60,
+        slow_connect=1,
+    )
+
+    for _ in range(2):
+        async with factory.session() as session:
+            assert (await session.exec(select(1))).one() == 1
+            assert session.bind is primary_engine
+
+    # The replica is not tried again before the retry interval has elapsed
+    assert get_pool_stats(engine=replica_engine)["checkouts"] == 1
+
+    await primary_engine.dispose()
+    await replica_engine.dispose()
+
+
+async def test_read_session_factory_replica(tmp_path: Path) -> None:
+    primary_engine = create_async_engine("sqlite+aiosqlite://")
+    replica_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'db'}")
+    factory = ReadSessionFactory(
+        primary=primary_engine,
+        replica=replica_engine,
+        retry_interval=60,
+        slow_connect=1,
+    )
+
+    async with factory.session() as session:
+        assert (await session.exec(select(1))).one() == 1
+        assert session.bind is replica_engine
+
+    await primary_engine.dispose()
+    await replica_engine.dispose()
+
+
+async def test_read_session_factory_lazy(tmp_path: Path) -> None:
+    primary_engine = create_async_engine(
+        "sqlite+aiosqlite://", poolclass=InstrumentedPool
+    )
+    replica_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'db'}", poolclass=InstrumentedPool
+    )
+    factory = ReadSessionFactory(
+        primary=primary_engine,
+        replica=replica_engine,
+        retry_interval=60,
+        slow_connect=1,
+    )
+
+    # Sessions not running any query do not check out connections
+    async with factory.session():
+        pass
+
+    for engine in (primary_engine, replica_engine):
+        assert get_pool_stats(engine=engine)["checkouts"] == 0
+        await engine.dispose()
+
+
+async def test_read_session_factory_replica_pool_timeout(tmp_path: Path) -> None:
+    primary_engine = create_async_engine("sqlite+aiosqlite://")
+    replica_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'db'}",
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.01,
+    )
+    factory = ReadSessionFactory(
+        primary=primary_engine,
+        replica=replica_engine,
+        retry_interval=60,
+        slow_connect=1,
+    )
+
+    # A saturated replica pool sends sessions to the primary
+    async with replica_engine.connect(), factory.session() as session:
+        assert (await session.exec(select(1))).one() == 1
+        assert session.bind is primary_engine
+
+    await primary_engine.dispose()
+    await replica_engine.dispose()
+
+
+async def test_read_session_factory_slow_replica(tmp_path: Path) -> None:
+    connected = asyncio.Event()
+
+    async def connect() -> aiosqlite.Connection:
+        await connected.wait()
+        return await aiosqlite.connect(tmp_path / "db")
+
+    primary_engine = create_async_engine("sqlite+aiosqlite://")
+    replica_engine = create_async_engine("sqlite+aiosqlite://", async_creator=connect)
+    factory = ReadSessionFactory(
+        primary=primary_engine,
+        replica=replica_engine,
+        retry_interval=60,
+        slow_connect=0.01,
+    )
+
+    async def read() -> object:
+        async with factory.session() as session:
+            await session.exec(select(1))
+            return session.bind
+
+    slow = asyncio.create_task(read())
+    await asyncio.sleep(0.05)
+    # Sessions opened while the replica is slow to connect do not wait for it
+    assert await asyncio.wait_for(read(), timeout=1) is primary_engine
+
+    connected.set()
+    assert await slow is replica_engine
+    # The replica is used again once the connection has succeeded
+    assert await read() is replica_engine
+
+    await primary_engine.dispose()
+    await replica_engine.dispose()
@@ -0,0 +1,17 @@
+from census_api.core.config import settings
+from census_api.core.http import SharedHTTPClient
+
+
+async def test_shared_http_client() -> None:
+    shared = SharedHTTPClient()
+
+    client = shared.get()
+    assert shared.get() is client
+    assert client.timeout.connect == settings.HTTP_CONNECT_TIMEOUT
+    assert client.timeout.read == settings.HTTP_READ_TIMEOUT
+
+    await shared.aclose()
+    assert client.is_closed
+    assert shared.get() is not client
+
+    await shared.aclose()
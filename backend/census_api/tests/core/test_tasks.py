@@ -0,0 +1,46 @@
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from census_api.core.tasks import run_exclusively
+from census_api.crud.dialect import try_advisory_xact_lock
+
+POSTGRES_URI = os.environ.get("CENSUS_TEST_POSTGRES_URI")
+
+
+async def test_run_exclusively() -> None:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    func = AsyncMock()
+
+    with patch(
+        "census_api.core.tasks.async_session",
+        async_sessionmaker(engine, class_=AsyncSession),
+    ):
+        assert await run_exclusively(name="test", func=func)
+
+    func.assert_awaited_once()
+    await engine.dispose()
+
+
+@pytest.mark.skipif(not POSTGRES_URI, reason="CENSUS_TEST_POSTGRES_URI is not set")
+async def test_run_exclusively_locked() -> None:
+    assert POSTGRES_URI
+    engine = create_async_engine(POSTGRES_URI)
+    sessions = async_sessionmaker(engine, class_=AsyncSession)
+    func = AsyncMock()
+
+    with patch("census_api.core.tasks.async_session", sessions):
+        async with sessions() as session:
+            # Another process is running the task
+            assert await try_advisory_xact_lock(session=session, name="task:test")
+            assert not await run_exclusively(name="test", func=func)
+        func.assert_not_awaited()
+
+        # The lock is released with the transaction holding it
+        assert await run_exclusively(name="test", func=func)
+        func.assert_awaited_once()
+
+    await engine.dispose()
@@ -1,18 +1,29 @@
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import Mock, patch
 
 import pytest
+from sqlmodel import col, func, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from census_api.core.config import settings
+from census_api.crud.counters import (
+    lock_counters,
+    replace_counters,
+    snapshot_counters,
+)
 from census_api.crud.records import (
-    create_record,
+    count_records,
     delete_expired_records,
-    get_record_for_update,
     get_records,
     get_summary,
-    update_record,
+    get_summary_from_records,
+    get_summary_history,
+    rebuild_counters,
+    upsert_record,
 )
+from census_api.enums import CensusDimension, CensusRecordEvent
 from census_api.models import CensusRecord
+from census_api.tests.helpers import create_record
 
 
 def _utcnow() -> datetime:
@@ -55,6 +66,25 @@ async def test_delete_expired_records(session: AsyncSession) -> None:
     assert count == 1
 
 
+async def test_delete_expired_records_in_batches(session: AsyncSession) -> None:
+    past = _utcnow() - timedelta(days=settings.RECORD_RETENTION + 1)
+    for i in range(5):
+        await create_record(
+            session=session,
+            deployment_id=f"expired-{i}",
+            version="1.0.0",
+            python_version="3.10",
+            country=None,
+            now=past,
+        )
+
+    count = await delete_expired_records(
+        session=session, start_time=_utcnow(), batch_size=2
+    )
+    assert count == 5  # noqa: PLR2004
+    assert await get_records(session=session, offset=0, limit=100) == []
+
+
 async def test_delete_expired_records_keeps_fresh(session: AsyncSession) -> None:
     now = _utcnow()
     session.add(
@@ -73,56 +103,100 @@ async def test_delete_expired_records_keeps_fresh(session: AsyncSession) -> None
     assert count == 0
 
 
-async def test_get_record_for_update_exists(
-    session: AsyncSession, sample_record: CensusRecord
-) -> None:
-    result = await get_record_for_update(
-        session=session, deployment_id=sample_record.deployment_id
+async def test_upsert_record_created(session: AsyncSession) -> None:
+    now = _utcnow()
+    result = await upsert_record(
+        session=session,
+        deployment_id="new-deploy",
+        version="2.0.0",
+        python_version="3.12",
+        now=now,
     )
-    assert result is not None
-    assert result.deployment_id == sample_record.deployment_id
+    assert result.event == CensusRecordEvent.CREATED
+    assert result.previous is None
+    assert result.record.version == "2.0.0"
+    assert result.record.country is None
+    assert result.record.created_at == now
+    assert result.record.updated_at == now
 
 
-async def test_get_record_for_update_missing(session: AsyncSession) -> None:
-    result = await get_record_for_update(session=session, deployment_id="nonexistent")
-    assert result is None
-
+async def test_upsert_record_updated(session: AsyncSession) -> None:
+    past = _utcnow() - timedelta(seconds=settings.RATE_LIMIT + 1)
+    await create_record(
+        session=session,
+        deployment_id="test-deploy",
+        version="1.9.0",
+        python_version="3.12",
+        country="FR",
+        now=past,
+    )
 
-async def test_create_record(session: AsyncSession) -> None:
     now = _utcnow()
-    record = await create_record(
+    result = await upsert_record(
         session=session,
-        deployment_id="new-deploy",
+        deployment_id="test-deploy",
         version="2.0.0",
-        python_version="3.12",
-        country="DE",
+        python_version="3.13",
+        country="FR",
         now=now,
     )
-    assert record.deployment_id == "new-deploy"
-    assert record.version == "2.0.0"
-    assert record.python_version == "3.12"
-    assert record.country == "DE"
-    assert record.created_at == now
-    assert record.updated_at == now
+    assert result.event == CensusRecordEvent.UPDATED
+    assert result.previous is not None
+    assert result.previous.version == "1.9.0"
+    assert result.record.version == "2.0.0"
+    assert result.record.python_version == "3.13"
+    assert result.record.country == "FR"
+    assert result.record.created_at == past
+    assert result.record.updated_at == now
+    assert await get_summary(session=session) == await get_summary_from_records(
+        session=session
+    )
 
 
-async def test_update_record(
+async def test_upsert_record_rate_limited(
     session: AsyncSession, sample_record: CensusRecord
 ) -> None:
-    now = _utcnow()
-    updated = await update_record(
+    result = await upsert_record(
         session=session,
-        db_record=sample_record,
+        deployment_id=sample_record.deployment_id,
         version="2.0.0",
         python_version="3.13",
-        country="GB",
-        now=now,
+        country="DE",
+        now=_utcnow(),
+    )
+    assert result.event is None
+    assert result.record.version == sample_record.version
+    assert result.record.country == sample_record.country
+    assert result.record.updated_at == sample_record.updated_at
+
+
+async def test_upsert_record_country(session: AsyncSession) -> None:
+    result = await upsert_record(
+        session=session,
+        deployment_id="new-deploy",
+        version="2.0.0",
+        python_version="3.12",
+        country="DE",
+        now=_utcnow() - timedelta(seconds=settings.RATE_LIMIT + 1),
+    )
+    assert result.record.country == "DE"
+    assert (await get_summary(session=session)).country[0].label == "DE"
+
+    # The country is written by the same statement as the rest of the record
+    result = await upsert_record(
+        session=session,
+        deployment_id="new-deploy",
+        version="2.0.0",
+        python_version="3.12",
+        country="FR",
+        now=_utcnow(),
+    )
+    assert result.record.country == "FR"
+    assert result.previous is not None
+    assert result.previous.country == "DE"
+    assert await get_summary(session=session) == await get_summary_from_records(
+        session=session
     )
-    assert updated.deployment_id == sample_record.deployment_id
-    assert updated.version == "2.0.0"
-    assert updated.python_version == "3.13"
-    assert updated.country == "GB"
-    assert updated.updated_at == now
 
 
 async def test_get_records(session: AsyncSession, sample_record: CensusRecord) -> None:
@@ -131,22 +205,214 @@ async def test_get_records(session: AsyncSession, sample_record: CensusRecord) -
     assert records[0].deployment_id == sample_record.deployment_id
 
 
+async def test_get_records_after(session: AsyncSession) -> None:
+    now = _utcnow()
+    for deployment_id in ("c", "a", "d", "b"):
+        await create_record(
+            session=session,
+            deployment_id=deployment_id,
+            version="1.9.0",
+            python_version="3.12",
+            country=None,
+            now=now,
+        )
+
+    records = await get_records(session=session, offset=0, limit=2)
+    assert [r.deployment_id for r in records] == ["a", "b"]
+
+    records = await get_records(session=session, offset=0, limit=2, after="b")
+    assert [r.deployment_id for r in records] == ["c", "d"]
+
+    records = await get_records(session=session, offset=1, limit=2)
+    assert [r.deployment_id for r in records] == ["b", "c"]
+
+
 async def test_get_summary(session: AsyncSession) -> None:
     now = _utcnow()
     for i in range(3):
-        session.add(
-            CensusRecord(
-                deployment_id=f"deploy-{i}",
-                version="1.9.0",
-                python_version="3.12",
-                country="FR",
-                created_at=now,
-                updated_at=now,
-            )
+        await create_record(
+            session=session,
+            deployment_id=f"deploy-{i}",
+            version="1.9.0",
+            python_version="3.12",
+            country="FR",
+            now=now,
         )
-    await session.commit()
 
     summaries = await get_summary(session=session)
     assert len(summaries.version) >= 1
     assert summaries.version[0].label == "1.9.0"
     assert summaries.version[0].count == 3  # noqa: PLR2004
+
+
+async def test_get_summary_matches_records(session: AsyncSession) -> None:
+    now = _utcnow()
+    past = now - timedelta(days=settings.RECORD_RETENTION + 1)
+    versions = ["1.9.0", "1.9.1", "1.8.0", "1.7.0", "1.6.0", "1.5.0", "1.4.0"]
+    for i in range(20):
+        await create_record(
+            session=session,
+            deployment_id=f"deploy-{i}",
+            version=versions[i % len(versions)],
+            python_version=None if i % 5 == 0 else f"3.{10 + i % 4}",
+            country=["FR", "DE", None][i % 3],
+            now=past if i % 4 == 0 else now,
+        )
+
+    await create_record(
+        session=session,
+        deployment_id="deploy-10",
+        version="2.0.0",
+        python_version="3.13",
+        country="GB",
+        now=now + timedelta(seconds=settings.RATE_LIMIT + 1),
+    )
+    await delete_expired_records(session=session, start_time=now)
+
+    assert await get_summary(session=session) == await get_summary_from_records(
+        session=session
+    )
+
+
+async def test_rebuild_counters(session: AsyncSession) -> None:
+    now = _utcnow()
+    session.add(
+        CensusRecord(
+            deployment_id="untracked",
+            version="1.9.0",
+            python_version="3.12",
+            country="FR",
+            created_at=now,
+            updated_at=now,
+        )
+    )
+    await session.commit()
+
+    # Records written without going through the CRUD are not counted
+    assert (await get_summary(session=session)).version == []
+
+    assert await rebuild_counters(session=session) == 3  # noqa: PLR2004
+    assert await get_summary(session=session) == await get_summary_from_records(
+        session=session
+    )
+
+
+async def test_rebuild_counters_locks_before_counting(session: AsyncSession) -> None:
+    crud = "census_api.crud.records"
+    calls = Mock()
+    with (
+        patch(f"{crud}.lock_counters", wraps=lock_counters) as lock,
+        patch(f"{crud}.count_records", wraps=count_records) as count,
+        patch(f"{crud}.replace_counters", wraps=replace_counters) as replace,
+    ):
+        calls.attach_mock(lock, "lock_counters")
+        calls.attach_mock(count, "count_records")
+        calls.attach_mock(replace, "replace_counters")
+        await rebuild_counters(session=session)
+
+    # Counts read before the lock could miss deltas committed in between
+    assert [name for name, *_ in calls.mock_calls] == [
+        "lock_counters",
+        "count_records",
+        "replace_counters",
+    ]
+
+
+async def test_get_summary_history(session: AsyncSession) -> None:
+    today = date(2026, 10, 17)
+    for i, day in enumerate([today - timedelta(days=2), today]):
+        await create_record(
+            session=session,
+            deployment_id=f"deploy-{i}",
+            version=f"1.{9 + i}.0",
+            python_version="3.12",
+            country=None,
+            now=_utcnow(),
+        )
+        assert await snapshot_counters(session=session, day=day) == 3 + i
+        await session.commit()
+    # Snapshots taken again the same day replace the previous ones
+    await snapshot_counters(session=session, day=today)
+    await session.commit()
+
+    history = await get_summary_history(
+        session=session,
+        dimension=CensusDimension.VERSION,
+        since=today - timedelta(days=6),
+        until=today,
+        max_points=10,
+    )
+    assert history.interval == 1
+    assert [point.day for point in history.points] == [
+        today - timedelta(days=2),
+        today,
+    ]
+    assert [item.label for item in history.points[0].summary] == ["1.9.0"]
+    assert [item.count for item in history.points[1].summary] == [1, 1]
+
+
+async def test_get_summary_history_downsampled(session: AsyncSession) -> None:
+    today = date(2026, 10, 17)
+    await create_record(
+        session=session,
+        deployment_id="deploy",
+        version="1.9.0",
+        python_version="3.12",
+        country="FR",
+        now=_utcnow(),
+    )
+    for days in range(10):
+        await snapshot_counters(session=session, day=today - timedelta(days=days))
+    await session.commit()
+
+    history = await get_summary_history(
+        session=session,
+        dimension=CensusDimension.COUNTRY,
+        since=today - timedelta(days=9),
+        until=today,
+        max_points=3,
+    )
+    # Intervals end on the last day, each one is represented by its last day
+    assert history.interval == 4  # noqa: PLR2004
+    assert [point.day for point in history.points] == [
+        today - timedelta(days=8),
+        today - timedelta(days=4),
+        today,
+    ]
+    assert history.points[0].summary[0].label == "FR"
+
+
+async def test_get_summary_at_scale(session: AsyncSession, dataset: int) -> None:
+    summaries = await get_summary(session=session)
+
+    assert summaries == await get_summary_from_records(session=session)
+    assert sum(item.count for item in summaries.country) == dataset
+    assert summaries.version[0].label == "1.10.0"
+
+
+async def test_get_records_at_scale(session: AsyncSession, dataset: int) -> None:
+    seen: list[str] = []
+    after = None
+    while page := await get_records(session=session, offset=0, limit=500, after=after):
+        seen.extend(record.deployment_id for record in page)
+        after = page[-1].deployment_id
+
+    assert len(seen) == dataset
+    assert seen == sorted(seen)
+
+
+async def test_delete_expired_records_at_scale(
+    session: AsyncSession, dataset: int
+) -> None:
+    now = _utcnow()
+    limit = now - timedelta(days=settings.RECORD_RETENTION)
+    result = await session.exec(
+        select(func.count()).where(col(CensusRecord.updated_at) < limit)
+    )
+    expired = result.one()
+    assert expired > 0
+
+    assert await delete_expired_records(session=session, start_time=now) == expired
+    summaries = await get_summary(session=session)
+    assert summaries == await get_summary_from_records(session=session)
+    assert sum(item.count for item in summaries.version) == dataset - expired
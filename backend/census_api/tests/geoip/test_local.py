@@ -0,0 +1,111 @@
+import asyncio
+import os
+from ipaddress import ip_address
+from pathlib import Path
+
+import pytest
+
+from census_api.core.config import settings
+from census_api.geoip import local_resolver
+from census_api.geoip.local import CountryDatabase, LocalResolver
+from census_api.utils import resolve_country_for_ip
+
+DATABASE = """start_ip,end_ip,country,country_name
+45.154.60.0,45.154.63.255,FR,France
+1.0.0.0,1.0.0.255,AU,Australia
+8.8.8.0,8.8.8.255,US,United States
+2001:678:794::,2001:678:794:ffff:ffff:ffff:ffff:ffff,FR,France
+2a00:1450::/32,US,United States
+not an ip,1.1.1.1,ZZ,Invalid
+"""
+
+
+@pytest.fixture(name="database_path")
+def database_path_fixture(tmp_path: Path) -> Path:
+    path = tmp_path / "country.csv"
+    path.write_text(DATABASE)
+    return path
+
+
+def _replace_database(path: Path, content: str) -> None:
+    stat = path.stat()
+    path.write_text(content)
+    # Make sure the change is noticed on filesystems with a coarse mtime resolution
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+
+@pytest.mark.parametrize(
+    ("address", "country"),
+    [
+        ("45.154.62.1", "FR"),
+        ("45.154.60.0", "FR"),
+        ("45.154.63.255", "FR"),
+        ("1.0.0.1", "AU"),
+        ("8.8.8.8", "US"),
+        ("2001:678:794::1", "FR"),
+        ("2a00:1450:4007:80e::200e", "US"),
+        ("0.0.0.1", None),
+        ("45.154.64.0", None),
+        ("9.9.9.9", None),
+        ("2001:678:795::1", None),
+    ],
+)
+def test_country_database_lookup(
+    database_path: Path, address: str, country: str | None
+) -> None:
+    database = CountryDatabase.from_csv(database_path)
+
+    assert len(database) == 5  # noqa: PLR2004
+    assert database.lookup(ip_address(address)) == country
+
+
+async def test_local_resolver_reload(database_path: Path) -> None:
+    resolver = LocalResolver(path=str(database_path))
+
+    assert await resolver.resolve(address=ip_address("9.9.9.9")) is None
+    assert await resolver.load()
+    assert await resolver.resolve(address=ip_address("8.8.8.8")) == "US"
+    # Unchanged files are not reloaded
+    assert not await resolver.load()
+
+    _replace_database(database_path, "8.8.8.0,8.8.8.255,DE\n9.9.9.0,9.9.9.255,CH\n")
+
+    assert await resolver.load()
+    assert await resolver.resolve(address=ip_address("8.8.8.8")) == "DE"
+    assert await resolver.resolve(address=ip_address("9.9.9.9")) == "CH"
+
+
+async def test_local_resolver_watch(database_path: Path) -> None:
+    resolver = LocalResolver(path=str(database_path))
+    await resolver.load()
+
+    async def reloaded() -> None:
+        while await resolver.resolve(address=ip_address("8.8.8.8")) != "DE":  # noqa: ASYNC110
+            await asyncio.sleep(0.05)
+
+    watcher = asyncio.create_task(resolver.watch())
+    await asyncio.sleep(0.2)
+    try:
+        _replace_database(database_path, "8.8.8.0,8.8.8.255,DE\n")
+        await asyncio.wait_for(reloaded(), timeout=5)
+    finally:
+        watcher.cancel()
+
+
+async def test_local_resolver_missing_file(tmp_path: Path) -> None:
+    resolver = LocalResolver(path=str(tmp_path / "missing.csv"))
+
+    assert not await resolver.load()
+    assert await resolver.resolve(address=ip_address("8.8.8.8")) is None
+
+
+async def test_resolve_country_for_ip_local(
+    database_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "GEOIP_BACKEND", "local")
+    monkeypatch.setattr(local_resolver, "path", database_path)
+    monkeypatch.setattr(local_resolver, "database", None)
+    await local_resolver.load()
+
+    assert await resolve_country_for_ip(ip_address="45.154.62.1") == "FR"
+    assert await resolve_country_for_ip(ip_address="192.168.0.1") is None
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from census_api.crud import records as crud
+from census_api.models import CensusRecord
+
+
+async def create_record(  # noqa: PLR0913
+    *,
+    session: AsyncSession,
+    deployment_id: str,
+    version: str,
+    python_version: str | None,
+    country: str | None,
+    now: datetime,
+) -> CensusRecord:
+    """
+    Seed a record through the same write path as reports, counters included.
+    """
+    result = await crud.upsert_record(
+        session=session,
+        deployment_id=deployment_id,
+        version=version,
+        python_version=python_version,
+        country=country,
+        now=now,
+    )
+    return result.record
@@ -0,0 +1,89 @@
+import json
+from collections.abc import Generator
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from httpx import codes
+from pytest_httpx import HTTPXMock
+
+from census_api.core.config import settings
+from census_api.enums import CensusRecordEvent
+from census_api.models import CensusRecord
+from census_api.notifications import Notification
+from census_api.notifications.discord import DiscordNotifier
+
+
+def _notification(deployment_id: str) -> Notification:
+    now = datetime.now(tz=timezone.utc)
+    return Notification(
+        event=CensusRecordEvent.CREATED,
+        record=CensusRecord(
+            deployment_id=deployment_id,
+            version="1.9.0",
+            python_version="3.12",
+            country="FR",
+            created_at=now,
+            updated_at=now,
+        ),
+    )
+
+
+@pytest.fixture
+def mock_sleep() -> Generator[AsyncMock]:
+    with patch(
+        "census_api.notifications.discord.asyncio.sleep", new_callable=AsyncMock
+    ) as mock:
+        yield mock
+
+
+async def test_send_batches_embeds(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(url=settings.DISCORD_WEBHOOK_URL, is_reusable=True)
+
+    await DiscordNotifier().send(
+        notifications=[_notification(f"deployment-{i}") for i in range(12)]
+    )
+
+    requests = httpx_mock.get_requests()
+    assert [len(json.loads(r.content)["embeds"]) for r in requests] == [10, 2]
+
+
+async def test_send_skips_duplicates(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(url=settings.DISCORD_WEBHOOK_URL)
+    notifier = DiscordNotifier()
+
+    await notifier.send(notifications=[_notification("a"), _notification("a")])
+    await notifier.send(notifications=[_notification("a")])
+
+    requests = httpx_mock.get_requests()
+    assert [len(json.loads(r.content)["embeds"]) for r in requests] == [1]
+
+
+async def test_send_rate_limited(httpx_mock: HTTPXMock, mock_sleep: AsyncMock) -> None:
+    httpx_mock.add_response(
+        url=settings.DISCORD_WEBHOOK_URL,
+        status_code=codes.TOO_MANY_REQUESTS,
+        json={"message": "You are being rate limited.", "retry_after": 1.5},
+    )
+    httpx_mock.add_response(url=settings.DISCORD_WEBHOOK_URL)
+
+    await DiscordNotifier().send(notifications=[_notification("a")])
+
+    assert len(httpx_mock.get_requests()) == 2  # noqa: PLR2004
+    mock_sleep.assert_awaited_once_with(1.5)
+
+
+async def test_send_failure_not_raised(
+    httpx_mock: HTTPXMock, mock_sleep: AsyncMock
+) -> None:
+    httpx_mock.add_response(
+        url=settings.DISCORD_WEBHOOK_URL,
+        status_code=codes.TOO_MANY_REQUESTS,
+        headers={"Retry-After": "2"},
+        is_reusable=True,
+    )
+
+    await DiscordNotifier().send(notifications=[_notification("a")])
+
+    assert len(httpx_mock.get_requests()) == 3  # noqa: PLR2004
+    assert mock_sleep.await_count == 2  # noqa: PLR2004
@@ -0,0 +1,86 @@
+import asyncio
+from collections.abc import Sequence
+from datetime import datetime, timezone
+
+from census_api.enums import CensusRecordEvent
+from census_api.models import CensusRecord
+from census_api.notifications import Notification, NotificationDispatcher
+
+
+class RecordingNotifier:
+    def __init__(self, *, delay: float = 0, fail: bool = False) -> None:
+        self.batches: list[list[str]] = []
+        self.delay = delay
+        self.fail = fail
+
+    async def send(self, *, notifications: Sequence[Notification]) -> None:
+        await asyncio.sleep(self.delay)
+        self.batches.append([n.record.deployment_id for n in notifications])
+        if self.fail:
+            raise RuntimeError("notifier failure")
+
+
+def _notification(deployment_id: str) -> Notification:
+    now = datetime.now(tz=timezone.utc)
+    return Notification(
+        event=CensusRecordEvent.CREATED,
+        record=CensusRecord(
+            deployment_id=deployment_id,
+            version="1.9.0",
+            python_version="3.12",
+            created_at=now,
+            updated_at=now,
+        ),
+    )
+
+
+async def test_dispatch_inline_when_not_started() -> None:
+    notifier = RecordingNotifier()
+    dispatcher = NotificationDispatcher(notifiers=[notifier], maxsize=10, batch_size=5)
+
+    await dispatcher.dispatch(_notification("a"))
+
+    assert notifier.batches == [["a"]]
+
+
+async def test_dispatch_batches_and_drains_on_stop() -> None:
+    notifier = RecordingNotifier(delay=0.01)
+    dispatcher = NotificationDispatcher(notifiers=[notifier], maxsize=10, batch_size=3)
+    dispatcher.start()
+
+    for i in range(7):
+        await dispatcher.dispatch(_notification(str(i)))
+    # Notifications are queued, not sent by the caller
+    assert notifier.batches == []
+
+    await dispatcher.stop(timeout=5)
+
+    assert notifier.batches == [["0", "1", "2"], ["3", "4", "5"], ["6"]]
+    assert len(dispatcher) == 0
+
+
+async def test_dispatch_queue_full() -> None:
+    notifier = RecordingNotifier()
+    dispatcher = NotificationDispatcher(notifiers=[notifier], maxsize=2, batch_size=5)
+    dispatcher.start()
+
+    for i in range(3):
+        await dispatcher.dispatch(_notification(str(i)))
+    await dispatcher.stop(timeout=5)
+
+    assert notifier.batches == [["0", "1"]]
+
+
+async def test_dispatch_failures_are_contained() -> None:
+    failing = RecordingNotifier(fail=True)
+    notifier = RecordingNotifier()
+    dispatcher = NotificationDispatcher(
+        notifiers=[failing, notifier], maxsize=10, batch_size=5
+    )
+
+    await dispatcher.dispatch(_notification("a"))
+    dispatcher.start()
+    await dispatcher.dispatch(_notification("b"))
+    await dispatcher.stop(timeout=5)
+
+    assert failing.batches == notifier.batches == [["a"], ["b"]]
@@ -0,0 +1,32 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from census_api.core.config import settings
+from census_api.generate_dataset import COLUMNS, generate_records
+
+NOW = datetime(2026, 10, 17, tzinfo=timezone.utc)
+
+
+def test_generate_records_is_reproducible() -> None:
+    first = list(generate_records(count=100, seed=1, now=NOW))
+
+    assert first == list(generate_records(count=100, seed=1, now=NOW))
+    assert first != list(generate_records(count=100, seed=2, now=NOW))
+    assert list(first[0]) == COLUMNS
+
+
+def test_generate_records_distributions() -> None:
+    records = list(generate_records(count=10_000, now=NOW))
+    # Records hold naive UTC times
+    now = NOW.replace(tzinfo=None)
+
+    assert len({r["deployment_id"] for r in records}) == len(records)
+    assert all(r["created_at"] <= r["updated_at"] <= now for r in records)
+
+    # Distributions are skewed towards recent versions, some records are expired
+    versions = Counter(r["version"] for r in records).most_common()
+    assert versions[0][0] == "1.10.0"
+    assert versions[0][1] > 10 * versions[-1][1]
+    limit = now - timedelta(days=settings.RECORD_RETENTION)
+    expired = sum(r["updated_at"] < limit for r in records)
+    assert 0.05 < expired / len(records) < 0.11  # noqa: PLR2004
@@ -0,0 +1,153 @@
+import asyncio
+from collections.abc import Sequence
+
+from prometheus_client import REGISTRY
+
+from census_api.services.buffer import WriteBehindBuffer
+
+
+class RecordingWriter:
+    def __init__(self, *, fail: bool = False, failures: int = 0) -> None:
+        self.batches: list[list[int]] = []
+        self.fail = fail
+        self.failures = failures
+        self.called = asyncio.Event()
+
+    async def __call__(self, items: Sequence[int]) -> None:
+        self.batches.append(list(items))
+        self.called.set()
+        if self.fail or len(self.batches) <= self.failures:
+            raise RuntimeError("write failure")
+
+
+def _dropped() -> float:
+    return REGISTRY.get_sample_value("census_ingest_buffer_dropped_total") or 0.0
+
+
+async def test_add_inline_when_not_started() -> None:
+    writer = RecordingWriter()
+    buffer = WriteBehindBuffer(write=writer, maxsize=10, batch_size=5, interval=10)
+
+    await buffer.add(1)
+
+    assert writer.batches == [[1]]
+
+
+async def test_flush_on_batch_size() -> None:
+    writer = RecordingWriter()
+    # The interval is long enough for the test to time out if it were waited for
+    buffer = WriteBehindBuffer(write=writer, maxsize=10, batch_size=3, interval=60)
+    buffer.start()
+
+    for i in range(3):
+        await buffer.add(i)
+    await asyncio.wait_for(buffer._queue.join(), timeout=5)  # noqa: SLF001
+
+    assert writer.batches == [[0, 1, 2]]
+    await buffer.stop(timeout=5)
+
+
+async def test_flush_on_interval() -> None:
+    writer = RecordingWriter()
+    buffer = WriteBehindBuffer(write=writer, maxsize=10, batch_size=100, interval=0.01)
+    buffer.start()
+
+    await buffer.add(0)
+    await buffer.add(1)
+    # Items are buffered, not written by the caller
+    assert writer.batches == []
+    await asyncio.sleep(0.1)
+
+    assert writer.batches == [[0, 1]]
+    await buffer.stop(timeout=5)
+
+
+async def test_flush_on_stop() -> None:
+    writer = RecordingWriter()
+    buffer = WriteBehindBuffer(write=writer, maxsize=10, batch_size=100, interval=60)
+    buffer.start()
+
+    for i in range(5):
+        await buffer.add(i)
+    await buffer.stop(timeout=5)
+
+    assert writer.batches == [[0, 1, 2, 3, 4]]
+    assert len(buffer) == 0
+
+
+async def test_write_failures_are_contained() -> None:
+    writer = RecordingWriter(fail=True)
+    buffer = WriteBehindBuffer(write=writer, maxsize=10, batch_size=100, interval=60)
+
+    await buffer.add(0)
+    buffer.start()
+    await buffer.add(1)
+    await buffer.stop(timeout=5)
+
+    assert writer.batches == [[0], [1]]
+
+
+async def test_write_failures_are_retried() -> None:
+    writer = RecordingWriter(failures=2)
+    buffer = WriteBehindBuffer(
+        write=writer,
+        maxsize=10,
+        batch_size=2,
+        interval=60,
+        max_retries=3,
+        retry_backoff=0.001,
+    )
+    dropped = _dropped()
+    buffer.start()
+
+    await buffer.add(0)
+    await buffer.add(1)
+    await asyncio.wait_for(buffer._queue.join(), timeout=5)  # noqa: SLF001
+
+    assert writer.batches == [[0, 1]] * 3
+    assert _dropped() == dropped
+    await buffer.stop(timeout=5)
+
+
+async def test_write_failures_dropped_after_retries() -> None:
+    writer = RecordingWriter(fail=True)
+    buffer = WriteBehindBuffer(
+        write=writer,
+        maxsize=10,
+        batch_size=2,
+        interval=60,
+        max_retries=2,
+        retry_backoff=0.001,
+    )
+    dropped = _dropped()
+    buffer.start()
+
+    await buffer.add(0)
+    await buffer.add(1)
+    await asyncio.wait_for(buffer._queue.join(), timeout=5)  # noqa: SLF001
+
+    assert writer.batches == [[0, 1]] * 3
+    assert _dropped() == dropped + 2
+    await buffer.stop(timeout=5)
+
+
+async def test_write_failures_retried_once_on_stop() -> None:
+    writer = RecordingWriter(fail=True)
+    # The backoff is long enough for the test to time out if it were waited for
+    buffer = WriteBehindBuffer(
+        write=writer,
+        maxsize=10,
+        batch_size=1,
+        interval=60,
+        max_retries=10,
+        retry_backoff=60,
+    )
+    dropped = _dropped()
+    buffer.start()
+
+    await buffer.add(0)
+    await asyncio.wait_for(writer.called.wait(), timeout=5)
+    await asyncio.wait_for(buffer.stop(timeout=5), timeout=5)
+
+    assert writer.batches == [[0], [0]]
+    assert _dropped() == dropped + 1
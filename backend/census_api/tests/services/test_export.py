@@ -0,0 +1,45 @@
+import pytest
+from fastapi import HTTPException, status
+
+from census_api.services.export import (
+    CSV_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    accepts_gzip,
+    negotiate_media_type,
+)
+
+
+@pytest.mark.parametrize(
+    ("accept", "media_type"),
+    [
+        (None, NDJSON_MEDIA_TYPE),
+        ("*/*", NDJSON_MEDIA_TYPE),
+        ("application/x-ndjson", NDJSON_MEDIA_TYPE),
+        ("text/csv", CSV_MEDIA_TYPE),
+        ("text/html, text/*;q=0.5", CSV_MEDIA_TYPE),
+        ("application/x-ndjson;q=0.5, text/csv", CSV_MEDIA_TYPE),
+        ("text/csv;q=0, */*;q=0.1", NDJSON_MEDIA_TYPE),
+    ],
+)
+def test_negotiate_media_type(accept: str | None, media_type: str) -> None:
+    assert negotiate_media_type(accept=accept) == media_type
+
+
+def test_negotiate_media_type_not_acceptable() -> None:
+    with pytest.raises(HTTPException) as exc_info:
+        negotiate_media_type(accept="text/html, application/xml")
+    assert exc_info.value.status_code == status.HTTP_406_NOT_ACCEPTABLE
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "result"),
+    [
+        (None, False),
+        ("br", False),
+        ("gzip, deflate, br", True),
+        ("gzip;q=0, br", False),
+        ("*", True),
+    ],
+)
+def test_accepts_gzip(accept_encoding: str | None, result: bool) -> None:  # noqa: FBT001
+    assert accepts_gzip(accept_encoding=accept_encoding) == result
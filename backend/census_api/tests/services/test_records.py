@@ -1,3 +1,4 @@
+import asyncio
 from collections.abc import Generator
 from datetime import datetime, timedelta, timezone
 from unittest.mock import AsyncMock, patch
@@ -7,8 +8,14 @@ from fastapi import HTTPException, status
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from census_api.core.config import settings
-from census_api.models import CensusRecord, CensusRecordUpdate
-from census_api.services.records import process_census_report
+from census_api.enums import CensusReportOutcome
+from census_api.models import CensusRecord, CensusRecordBatchItem, CensusRecordUpdate
+from census_api.services.records import (
+    RateLimitedRecord,
+    process_census_report,
+    process_census_reports,
+    rate_limit_cache,
+)
 
 
 def _utcnow() -> datetime:
@@ -18,8 +25,9 @@ def _utcnow() -> datetime:
 
 @pytest.fixture
 def mock_notifier() -> Generator[AsyncMock]:
-    mock = AsyncMock()
-    with patch("census_api.services.records.get_notifiers", return_value=[mock]):
+    with patch(
+        "census_api.services.records.notification_dispatcher", new_callable=AsyncMock
+    ) as mock:
         yield mock
 
 
@@ -33,18 +41,38 @@ def mock_country() -> Generator[None]:
         yield
 
 
-@pytest.mark.usefixtures("mock_notifier", "mock_country")
-async def test_process_census_report_new_record(session: AsyncSession) -> None:
+@pytest.mark.usefixtures("mock_country")
+async def test_process_census_report_new_record(
+    session: AsyncSession, mock_notifier: AsyncMock
+) -> None:
     record = CensusRecordUpdate(
         deployment_id="new-deploy", version="1.9.0", python_version="3.12.0"
     )
-    result = await process_census_report(
-        session=session, record=record, real_ip="1.2.3.4"
-    )
+    with patch.object(session, "commit", wraps=session.commit) as commit:
+        result = await process_census_report(
+            session=session, record=record, real_ip="1.2.3.4"
+        )
     assert result.deployment_id == "new-deploy"
     assert result.version == "1.9.0"
     assert result.python_version == "3.12"
     assert result.country == "FR"
+    # The record is written with its country at once, never visible without it
+    commit.assert_awaited_once()
+    mock_notifier.dispatch.assert_awaited_once()
+
+
+async def test_process_census_report_invalid_real_ip(
+    session: AsyncSession, mock_notifier: AsyncMock
+) -> None:
+    record = CensusRecordUpdate(
+        deployment_id="invalid-ip", version="1.9.0", python_version="3.12.0"
+    )
+    result = await process_census_report(
+        session=session, record=record, real_ip="not-an-address"
+    )
+    assert result.deployment_id == "invalid-ip"
+    assert result.country is None
+    mock_notifier.dispatch.assert_awaited_once()
 
 
 @pytest.mark.usefixtures("mock_notifier", "mock_country")
@@ -65,12 +93,15 @@ async def test_process_census_report_update_record(session: AsyncSession) -> Non
     record = CensusRecordUpdate(
         deployment_id="existing", version="1.9.0", python_version="3.12.0"
     )
-    result = await process_census_report(
-        session=session, record=record, real_ip="1.2.3.4"
-    )
+    with patch.object(session, "commit", wraps=session.commit) as commit:
+        result = await process_census_report(
+            session=session, record=record, real_ip="1.2.3.4"
+        )
     assert result.version == "1.9.0"
     assert result.python_version == "3.12"
+    assert result.country == "FR"
     assert result.updated_at > past
+    commit.assert_awaited_once()
 
 
 @pytest.mark.usefixtures("mock_notifier", "mock_country")
@@ -136,4 +167,190 @@ async def test_process_census_report_no_notification_when_unchanged(
         deployment_id="unchanged", version="1.9.0", python_version="3.12.0"
     )
     await process_census_report(session=session, record=record, real_ip="1.2.3.4")
-    mock_notifier.send.assert_not_called()
+    mock_notifier.dispatch.assert_not_called()
+
+
+@pytest.mark.usefixtures("mock_notifier", "mock_country")
+async def test_process_census_report_rate_limit_cached(session: AsyncSession) -> None:
+    record = CensusRecordUpdate(
+        deployment_id="cached", version="1.9.0", python_version="3.12.0"
+    )
+    created = await process_census_report(
+        session=session, record=record, real_ip="1.2.3.4"
+    )
+
+    # Reports within the rate limit window do not reach the database
+    with patch(
+        "census_api.services.records.crud.upsert_record", new_callable=AsyncMock
+    ) as upsert_record:
+        result = await process_census_report(
+            session=session, record=record, real_ip="1.2.3.4"
+        )
+
+    upsert_record.assert_not_called()
+    assert result == created
+    assert result.country == "FR"
+    # Entries only keep the record columns, not a model instance
+    entry = rate_limit_cache.get("cached")
+    assert entry is not None
+    assert isinstance(entry.value, RateLimitedRecord)
+
+
+@pytest.mark.usefixtures("mock_notifier", "mock_country")
+async def test_process_census_report_rate_limit_near_boundary(
+    session: AsyncSession,
+) -> None:
+    # The rate limit window ends within the cache margin
+    almost = _utcnow() - timedelta(
+        seconds=settings.RATE_LIMIT - settings.RATE_LIMIT_CACHE_MARGIN / 2
+    )
+    session.add(
+        CensusRecord(
+            deployment_id="almost",
+            version="1.8.0",
+            python_version="3.11",
+            country="DE",
+            created_at=almost,
+            updated_at=almost,
+        )
+    )
+    await session.commit()
+
+    record = CensusRecordUpdate(
+        deployment_id="almost", version="1.9.0", python_version="3.12.0"
+    )
+    result = await process_census_report(
+        session=session, record=record, real_ip="1.2.3.4"
+    )
+
+    assert result.version == "1.8.0"
+    assert rate_limit_cache.get("almost") is None
+
+
+async def test_process_census_reports(
+    session: AsyncSession, mock_notifier: AsyncMock
+) -> None:
+    settings.DEPLOYMENT_IDS_TO_IGNORE = ["ignored-id"]
+    past = _utcnow() - timedelta(seconds=settings.RATE_LIMIT + 1)
+    session.add(
+        CensusRecord(
+            deployment_id="existing",
+            version="1.8.0",
+            python_version="3.11",
+            country="DE",
+            created_at=past,
+            updated_at=past,
+        )
+    )
+    await session.commit()
+
+    countries = {"1.2.3.4": "FR", "5.6.7.8": "DE"}
+    with patch(
+        "census_api.services.records.resolve_country_for_ip",
+        new_callable=AsyncMock,
+        side_effect=lambda *, ip_address: countries[ip_address],
+    ):
+        results = await process_census_reports(
+            session=session,
+            records=[
+                CensusRecordBatchItem(
+                    deployment_id="new-deploy",
+                    version="1.9.0",
+                    python_version="3.12.0",
+                    ip_address="1.2.3.4",
+                ),
+                CensusRecordBatchItem(
+                    deployment_id="existing",
+                    version="1.9.0",
+                    python_version="3.12.1",
+                    ip_address="5.6.7.8",
+                ),
+                CensusRecordBatchItem(
+                    deployment_id="new-deploy", version="2.0.0", python_version="3.13"
+                ),
+                CensusRecordBatchItem(
+                    deployment_id="ignored-id", version="1.9.0", python_version="3.12"
+                ),
+            ],
+        )
+
+    assert [result.outcome for result in results] == [
+        CensusReportOutcome.CREATED,
+        CensusReportOutcome.UPDATED,
+        CensusReportOutcome.RATE_LIMITED,
+        CensusReportOutcome.IGNORED,
+    ]
+    new, existing, duplicate, ignored = (result.record for result in results)
+    assert new is not None
+    assert new.version == "1.9.0"
+    assert new.country == "FR"
+    assert existing is not None
+    assert existing.python_version == "3.12"
+    assert existing.country == "DE"
+    assert existing.updated_at > past
+    # Duplicates are rate limited by the first report of the batch
+    assert duplicate == new
+    assert ignored is None
+    assert mock_notifier.dispatch.await_count == 2  # noqa: PLR2004
+
+
+@pytest.mark.usefixtures("mock_notifier")
+async def test_process_census_reports_concurrent_lookups(session: AsyncSession) -> None:
+    running = 0
+    max_running = 0
+
+    async def resolve_country_for_ip(*, ip_address: str) -> str:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0)
+        running -= 1
+        return "FR"
+
+    with patch(
+        "census_api.services.records.resolve_country_for_ip",
+        side_effect=resolve_country_for_ip,
+    ):
+        results = await process_census_reports(
+            session=session,
+            records=[
+                CensusRecordBatchItem(
+                    deployment_id=f"deploy-{i}",
+                    version="1.9.0",
+                    python_version="3.12",
+                    ip_address=f"1.2.3.{i}",
+                )
+                for i in range(50)
+            ],
+        )
+
+    assert all(result.record and result.record.country == "FR" for result in results)
+    assert max_running == settings.GEOIP_BATCH_CONCURRENCY
+
+
+@pytest.mark.usefixtures("mock_notifier", "mock_country")
+async def test_process_census_reports_rate_limited(session: AsyncSession) -> None:
+    recent = _utcnow() - timedelta(seconds=10)
+    session.add(
+        CensusRecord(
+            deployment_id="recent",
+            version="1.8.0",
+            python_version="3.11",
+            created_at=recent,
+            updated_at=recent,
+        )
+    )
+    await session.commit()
+
+    records = [
+        CensusRecordBatchItem(
+            deployment_id="recent", version="1.9.0", python_version="3.12.0"
+        )
+    ]
+    for _ in range(2):
+        # Answered by the database first, then by the cache
+        (result,) = await process_census_reports(session=session, records=records)
+        assert result.outcome == CensusReportOutcome.RATE_LIMITED
+        assert result.record is not None
+        assert result.record.version == "1.8.0"
+    assert rate_limit_cache.get("recent") is not None
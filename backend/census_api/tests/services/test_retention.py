@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from census_api.core.config import settings
+from census_api.services.retention import expire_records
+from census_api.services.summary import summary_cache
+from census_api.tests.helpers import create_record
+
+
+def _utcnow() -> datetime:
+    """Return a naive UTC datetime matching what SQLite round-trips."""
+    return datetime.now(tz=timezone.utc).replace(tzinfo=None)
+
+
+async def test_expire_records(session: AsyncSession) -> None:
+    past = _utcnow() - timedelta(days=settings.RECORD_RETENTION + 1)
+    await create_record(
+        session=session,
+        deployment_id="expired",
+        version="1.0.0",
+        python_version="3.10",
+        country=None,
+        now=past,
+    )
+    entry = await summary_cache.get(session=session)
+
+    assert await expire_records(session=session) == 1
+    # The summary must not be served from cache once records are deleted
+    assert await summary_cache.get(session=session) != entry
+
+
+async def test_expire_records_nothing_expired(session: AsyncSession) -> None:
+    await create_record(
+        session=session,
+        deployment_id="fresh",
+        version="1.0.0",
+        python_version="3.12",
+        country=None,
+        now=_utcnow(),
+    )
+    entry = await summary_cache.get(session=session)
+
+    assert await expire_records(session=session) == 0
+    assert await summary_cache.get(session=session) is entry
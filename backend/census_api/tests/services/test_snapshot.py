@@ -0,0 +1,58 @@
+import gzip
+import stat
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from census_api.core.config import settings
+from census_api.models import CensusSummarySnapshot
+from census_api.services.snapshot import write_summary_snapshot
+from census_api.tests.helpers import create_record
+
+
+def _files(directory: Path) -> list[str]:
+    return sorted(path.name for path in directory.iterdir())
+
+
+async def test_write_summary_snapshot(session: AsyncSession, tmp_path: Path) -> None:
+    await create_record(
+        session=session,
+        deployment_id="snapshot",
+        version="1.10.0",
+        python_version="3.12",
+        country="FR",
+        now=datetime.now(tz=timezone.utc).replace(tzinfo=None),
+    )
+
+    snapshot = await write_summary_snapshot(session=session, directory=tmp_path)
+
+    content = (tmp_path / "summary.json").read_bytes()
+    assert CensusSummarySnapshot.model_validate_json(content) == snapshot
+    assert gzip.decompress((tmp_path / "summary.json.gz").read_bytes()) == content
+    assert [s.label for s in snapshot.summary.version] == ["1.10.0"]
+    assert snapshot.expires_at - snapshot.generated_at == timedelta(
+        seconds=settings.SUMMARY_SNAPSHOT_MAX_AGE
+    )
+    # Readable by the web server, without temporary files left behind
+    assert (tmp_path / "summary.json").stat().st_mode & stat.S_IROTH
+    assert _files(tmp_path) == ["summary.json", "summary.json.gz"]
+
+
+async def test_write_summary_snapshot_failure(
+    session: AsyncSession, tmp_path: Path
+) -> None:
+    await write_summary_snapshot(session=session, directory=tmp_path)
+    previous = (tmp_path / "summary.json").read_bytes()
+
+    with (
+        patch("pathlib.Path.replace", side_effect=OSError("disk full")),
+        pytest.raises(OSError, match="disk full"),
+    ):
+        await write_summary_snapshot(session=session, directory=tmp_path)
+
+    # The previous snapshot is still served whole
+    assert (tmp_path / "summary.json").read_bytes() == previous
+    assert _files(tmp_path) == ["summary.json", "summary.json.gz"]
@@ -0,0 +1,73 @@
+import asyncio
+from collections.abc import Generator
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from census_api.models import CensusSummaries
+from census_api.services.summary import SummaryCache, etag_matches
+
+_EMPTY = CensusSummaries(version=[], python_version=[], country=[])
+
+
+@pytest.fixture
+def mock_get_summary() -> Generator[AsyncMock]:
+    async def get_summary(**kwargs: object) -> CensusSummaries:
+        await asyncio.sleep(0)
+        return _EMPTY
+
+    with patch(
+        "census_api.services.summary.crud.get_summary", side_effect=get_summary
+    ) as mock:
+        yield mock
+
+
+async def test_summary_cache_hit(
+    session: AsyncSession, mock_get_summary: AsyncMock
+) -> None:
+    cache = SummaryCache()
+
+    first = await cache.get(session=session)
+    second = await cache.get(session=session)
+
+    assert first is second
+    assert first.body == _EMPTY.model_dump_json().encode()
+    mock_get_summary.assert_called_once()
+
+
+async def test_summary_cache_invalidate(
+    session: AsyncSession, mock_get_summary: AsyncMock
+) -> None:
+    cache = SummaryCache()
+
+    await cache.get(session=session)
+    cache.invalidate()
+    await cache.get(session=session)
+
+    assert mock_get_summary.call_count == 2  # noqa: PLR2004
+
+
+async def test_summary_cache_concurrent_misses(
+    session: AsyncSession, mock_get_summary: AsyncMock
+) -> None:
+    cache = SummaryCache()
+
+    entries = await asyncio.gather(*(cache.get(session=session) for _ in range(10)))
+
+    assert len({entry.etag for entry in entries}) == 1
+    mock_get_summary.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    ("if_none_match", "result"),
+    [
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"def", "abc"', True),
+        ("*", True),
+        ('"def"', False),
+    ],
+)
+def test_etag_matches(if_none_match: str, result: bool) -> None:  # noqa: FBT001
+    assert etag_matches(if_none_match=if_none_match, etag='"abc"') == result
@@ -1,9 +1,12 @@
+import asyncio
 import re
 
+import httpx
 import pytest
 from pytest_httpx import HTTPXMock
 
 from census_api.core.config import settings
+from census_api.geoip import ipinfo_resolver
 from census_api.utils import resolve_country_for_ip, version_strip_micro
 
 
@@ -21,6 +24,66 @@ async def test_resolve_country_for_ip(
     assert await resolve_country_for_ip(ip_address=ip_address) == country
 
 
+async def test_resolve_country_for_ip_failure(httpx_mock: HTTPXMock) -> None:
+    settings.IPINFO_TOKEN = "abcdef0123456789"
+    httpx_mock.add_response(
+        url=re.compile(f"{settings.IPINFO_API_URL}.*"),
+        status_code=httpx.codes.TOO_MANY_REQUESTS,
+    )
+
+    assert await resolve_country_for_ip(ip_address="45.154.62.1") is None
+    # Failures are not cached
+    assert len(ipinfo_resolver.cache) == 0
+
+
+async def test_resolve_country_for_ip_timeout(httpx_mock: HTTPXMock) -> None:
+    settings.IPINFO_TOKEN = "abcdef0123456789"
+    httpx_mock.add_exception(httpx.ReadTimeout("timed out"))
+
+    assert await resolve_country_for_ip(ip_address="45.154.62.1") is None
+
+
+async def test_resolve_country_for_ip_cached(httpx_mock: HTTPXMock) -> None:
+    settings.IPINFO_TOKEN = "abcdef0123456789"
+    httpx_mock.add_response(
+        url=re.compile(f"{settings.IPINFO_API_URL}45.154.62.1.*"),
+        json={"country_code": "FR"},
+    )
+    httpx_mock.add_response(
+        url=re.compile(f"{settings.IPINFO_API_URL}1.1.1.1.*"),
+        json={"country_code": None},
+    )
+
+    assert await resolve_country_for_ip(ip_address="45.154.62.1") == "FR"
+    assert await resolve_country_for_ip(ip_address="45.154.62.1") == "FR"
+    # Addresses without a country are cached as well
+    assert await resolve_country_for_ip(ip_address="1.1.1.1") is None
+    assert await resolve_country_for_ip(ip_address="1.1.1.1") is None
+
+    assert len(httpx_mock.get_requests()) == 2  # noqa: PLR2004
+    assert ipinfo_resolver.cache.stats() == {"size": 2, "hits": 2, "misses": 2}
+
+
+async def test_resolve_country_for_ip_coalesced(httpx_mock: HTTPXMock) -> None:
+    settings.IPINFO_TOKEN = "abcdef0123456789"
+    httpx_mock.add_response(
+        url=re.compile(f"{settings.IPINFO_API_URL}.*"), json={"country_code": "FR"}
+    )
+
+    countries = await asyncio.gather(
+        *(resolve_country_for_ip(ip_address="45.154.62.1") for _ in range(10))
+    )
+
+    assert countries == ["FR"] * 10
+    assert len(httpx_mock.get_requests()) == 1
+
+
+async def test_resolve_country_for_ip_private() -> None:
+    settings.IPINFO_TOKEN = "abcdef0123456789"
+
+    assert await resolve_country_for_ip(ip_address="192.168.0.1") is None
+
+
 @pytest.mark.parametrize(
     ("version", "result"),
     [(None, None), ("1", "1.0"), ("1.2", "1.2"), ("1.2.3", "1.2"), ("abcdef", None)],
@@ -1,17 +1,16 @@
 import ipaddress
-import logging
 
-import httpx
 from packaging.version import InvalidVersion, Version
 
-from .core.config import settings
+from .geoip import get_resolver
 
 
 async def resolve_country_for_ip(*, ip_address: str) -> str | None:
     """
     Return a country given an IP address.
 
-    The resolution is performed by using the ipinfo.io API.
+    The resolution is performed by the backend selected with `GEOIP_BACKEND`, either
+    the ipinfo.io API or a local IP ranges database.
 
     Args:
         ip_address (str): IP address to get the country for.
@@ -19,27 +18,11 @@ async def resolve_country_for_ip(*, ip_address: str) -> str | None:
     Returns:
         str | None: A country code or none if the IP does not resolve to a country.
     """
-    if not settings.IPINFO_TOKEN:
-        logging.error("cannot use ipinfo lookup, IPINFO_TOKEN not set")
-        return None
-
     address = ipaddress.ip_address(address=ip_address)
     if address.is_private:
         return None
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(
-            f"{settings.IPINFO_API_URL}{ip_address}",
-            params={"token": settings.IPINFO_TOKEN},
-        )
-
-        try:
-            r.raise_for_status()
-        except httpx.HTTPStatusError as exc:
-            logging.error(f"ipinfo lookup failure: {exc.request.url} - {exc}")
-
-        country_code = r.json().get("country_code", None)
-        return str(country_code) if country_code else None
+    return await get_resolver().resolve(address=address)
 
 
 def version_strip_micro(*, version: str | None) -> str | None:
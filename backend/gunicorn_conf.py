@@ -1,5 +1,8 @@
 import multiprocessing
 import os
+from typing import Any
+
+from prometheus_client import multiprocess
 
 workers_per_core_str = os.getenv("WORKERS_PER_CORE", "1")
 max_workers_str = os.getenv("MAX_WORKERS")
@@ -43,3 +46,9 @@ accesslog = use_accesslog
 graceful_timeout = int(graceful_timeout_str)
 timeout = int(timeout_str)
 keepalive = int(keepalive_str)
+
+
+def child_exit(server: Any, worker: Any) -> None:  # noqa: ARG001
+    # Drop the live gauges of workers which exited from the aggregated metrics
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)  # type: ignore[no-untyped-call]
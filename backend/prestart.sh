@@ -3,5 +3,11 @@
 set -e
 set -x
 
+# Metrics of previous runs must not be aggregated with the ones of this run
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 python /app/census_api/backend_pre_start.py
 alembic upgrade head
@@ -4,7 +4,27 @@ const CHART_TITLES = {
     country: "Top 5 Countries by %",
 };
 
+async function fetchSnapshot() {
+    const response = await fetch("/snapshot/summary.json");
+    if (!response.ok) {
+        return null;
+    }
+    const snapshot = await response.json();
+    // A stale snapshot means the backend stopped writing it, ask the API instead
+    if (Date.parse(snapshot.expires_at) < Date.now()) {
+        return null;
+    }
+    return snapshot.summary;
+}
+
 async function fetchData() {
+    try {
+        const summary = await fetchSnapshot();
+        if (summary) return summary;
+    } catch {
+        // Missing or unreadable snapshot, fall back to the API
+    }
+
     const response = await fetch("/api/v1/records/summary/");
     if (!response.ok) {
         throw new Error(`API returned ${response.status}`);